@@ -0,0 +1,27 @@
+"""
+Scratch state for the benchmarks that import main.
+
+Importing main opens the vector store and the caches under backend/, so
+these benchmarks call use_scratch_state() before the import to send them to
+a throwaway directory instead of the live ones.
+"""
+import os
+import tempfile
+from typing import Optional
+
+
+def use_scratch_state(directory: Optional[str] = None, offline: bool = True) -> str:
+    """
+    Point main's vector store and caches at `directory` (a new temp directory
+    by default) and return it. `offline` benchmarks make no OpenAI calls and
+    get a placeholder key unless one is set, since main refuses to start
+    without it.
+    """
+    if directory is None:
+        directory = tempfile.mkdtemp(prefix="docuquest-bench-")
+    if offline:
+        os.environ.setdefault("OPENAI_API_KEY", "sk-benchmark")
+    os.environ["DATA_DIR"] = os.path.join(directory, "data")
+    os.environ["CHROMA_PATH"] = os.path.join(directory, "chroma_db")
+    os.environ["NUMPY_STORE_PATH"] = os.path.join(directory, "numpy_store")
+    return directory
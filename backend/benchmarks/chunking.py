@@ -0,0 +1,75 @@
+"""
+Chunker throughput: legacy character slicing vs the token-based chunk_text.
+
+Also prints the spread of tokens per chunk, which is what the token-based
+chunker is meant to tighten. Run from backend/, optionally on a real text
+file (it is repeated to reach each size):
+
+    python -m benchmarks.chunking --sizes-mb 1 4 16 --text corpus.txt
+"""
+import argparse
+import random
+import statistics
+import time
+
+from chunking import chunk_text, count_tokens, get_tokenizer
+
+
+def legacy_chunk_text(text: str, chunk_size: int = 1000, overlap: int = 200):
+    # The character slicer chunk_text used before it measured tokens
+    chunks = []
+    start = 0
+    length = len(text)
+    while start < length:
+        end = min(start + chunk_size, length)
+        chunks.append(text[start:end])
+        start += chunk_size - overlap
+    return chunks
+
+
+def synthetic_text(size: int) -> str:
+    rng = random.Random(0)
+    words = "the of and to in is was for on that with as by at from document query answer".split()
+    paragraphs = []
+    total = 0
+    while total < size:
+        sentences = [
+            " ".join(rng.choice(words) for _ in range(rng.randint(4, 30))).capitalize() + "."
+            for _ in range(rng.randint(1, 8))
+        ]
+        paragraphs.append(" ".join(sentences))
+        total += len(paragraphs[-1]) + 2
+    return "\n\n".join(paragraphs)[:size]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sizes-mb", type=float, nargs="+", default=[1, 4, 16])
+    parser.add_argument("--text", help="UTF-8 file to use instead of synthetic text")
+    args = parser.parse_args()
+
+    tokenizer = "loaded" if get_tokenizer() is not None else "unavailable, estimated counts"
+    print(f"tokenizer: {tokenizer}")
+    print(f"{'chunker':<8} {'MB':>6} {'chunks':>8} {'s':>7} {'MB/s':>7} {'tok mean':>9} {'tok sd':>7} {'tok max':>8}")
+    for size_mb in args.sizes_mb:
+        size = int(size_mb * 1024 * 1024)
+        if args.text:
+            with open(args.text, encoding="utf-8") as f:
+                sample = f.read()
+            text = (sample * (size // max(1, len(sample)) + 1))[:size]
+        else:
+            text = synthetic_text(size)
+
+        for name, chunker in (("legacy", legacy_chunk_text), ("tokens", lambda t: [c.text for c in chunk_text(t)])):
+            start = time.perf_counter()
+            chunks = chunker(text)
+            elapsed = time.perf_counter() - start
+            tokens = count_tokens(chunks)
+            print(
+                f"{name:<8} {size_mb:>6g} {len(chunks):>8} {elapsed:>7.2f} {size_mb / elapsed:>7.1f} "
+                f"{statistics.mean(tokens):>9.1f} {statistics.pstdev(tokens):>7.1f} {max(tokens):>8}"
+            )
+
+
+if __name__ == "__main__":
+    main()
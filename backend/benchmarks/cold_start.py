@@ -0,0 +1,105 @@
+"""
+Cold start of the persistent store: from a fresh process to the first answer.
+
+Builds a persistent Chroma store of random unit vectors (or reuses one with
+--path), then times, in a fresh subprocess each round: importing chromadb,
+opening the client and collection, the first query (which loads the HNSW
+segment from disk) and a warm query. Run from backend/:
+
+    python -m benchmarks.cold_start --rows 100000 --dimensions 1536 --path /tmp/docuquest-store
+"""
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+COLLECTION = "documents"
+BUILD_BATCH = 5000
+
+
+def build(path: str, rows: int, dimensions: int) -> None:
+    import chromadb
+    import numpy as np
+    from chromadb.config import Settings
+
+    client = chromadb.PersistentClient(path=path, settings=Settings(anonymized_telemetry=False))
+    collection = client.get_or_create_collection(COLLECTION)
+    rng = np.random.default_rng(0)
+    for first in range(collection.count(), rows, BUILD_BATCH):
+        n = min(BUILD_BATCH, rows - first)
+        vectors = rng.standard_normal((n, dimensions), dtype=np.float32)
+        vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+        collection.add(
+            ids=[f"bench_{first + i}" for i in range(n)],
+            embeddings=vectors,
+            metadatas=[{"source": "bench", "chunk_index": first + i} for i in range(n)],
+            documents=["DocuQuest cold start benchmark chunk."] * n,
+        )
+
+
+def measure(path: str, dimensions: int) -> None:
+    started = time.perf_counter()
+    import chromadb
+    import numpy as np
+    from chromadb.config import Settings
+
+    imported = time.perf_counter()
+    client = chromadb.PersistentClient(path=path, settings=Settings(anonymized_telemetry=False))
+    collection = client.get_collection(COLLECTION)
+    rows = collection.count()
+    opened = time.perf_counter()
+
+    query = np.random.default_rng(1).standard_normal((1, dimensions), dtype=np.float32)
+    collection.query(query_embeddings=query, n_results=3)
+    first = time.perf_counter()
+    collection.query(query_embeddings=query, n_results=3)
+    warm = time.perf_counter()
+    print(json.dumps({
+        "rows": rows,
+        "import_s": imported - started,
+        "open_s": opened - imported,
+        "first_query_s": first - opened,
+        "warm_query_ms": (warm - first) * 1000,
+        "ready_s": first - started,
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    }))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--dimensions", type=int, default=1536)
+    parser.add_argument("--path", help="Store directory to build or reuse (default: a temporary one)")
+    parser.add_argument("--rounds", type=int, default=3)
+    parser.add_argument("--worker", action="store_true")
+    args = parser.parse_args()
+
+    if args.worker:
+        measure(args.path, args.dimensions)
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = args.path or os.path.join(tmp, "store")
+        started = time.perf_counter()
+        build(path, args.rows, args.dimensions)
+        print(f"store of {args.rows} x {args.dimensions} ready in {time.perf_counter() - started:.1f}s")
+        print(f"{'round':>5} {'import s':>9} {'open s':>7} {'1st query s':>12} {'warm ms':>8} {'ready s':>8} {'RSS MB':>7}")
+        for round_ in range(1, args.rounds + 1):
+            out = subprocess.run(
+                [sys.executable, "-m", "benchmarks.cold_start", "--worker",
+                 "--path", path, "--dimensions", str(args.dimensions)],
+                check=True, capture_output=True, text=True,
+            ).stdout
+            r = json.loads(out.strip().splitlines()[-1])
+            print(
+                f"{round_:>5} {r['import_s']:>9.2f} {r['open_s']:>7.2f} {r['first_query_s']:>12.2f} "
+                f"{r['warm_query_ms']:>8.1f} {r['ready_s']:>8.2f} {r['peak_rss_mb']:>7.0f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+"""
+Shortened embeddings: index size, query latency and recall per width.
+
+text-embedding-3 models shorten an embedding by keeping its leading
+dimensions and re-normalizing, so each width here is cut from the same
+full-width vectors: a snapshot's embeddings (GET /export?format=arrow, or
+Parquet) or random unit vectors. Random vectors spread information evenly
+over all dimensions, unlike the model's, so they understate recall; use a
+snapshot for real numbers. Recall is against exact top-k at full width.
+Run from backend/:
+
+    python -m benchmarks.embedding_dimensions --snapshot index.arrow --widths 256 512 1536
+"""
+import argparse
+import os
+import statistics
+import tempfile
+import time
+
+import chromadb
+import numpy as np
+from chromadb.config import Settings
+
+from snapshots import _embeddings, read_snapshot
+from vector_store import NumpyVectorStore
+
+BUILD_BATCH = 5000
+
+
+def load_vectors(args) -> np.ndarray:
+    if not args.snapshot:
+        rng = np.random.default_rng(0)
+        vectors = rng.standard_normal((args.rows, 1536), dtype=np.float32)
+    else:
+        parts = []
+        rows = 0
+        for batch in read_snapshot(args.snapshot, BUILD_BATCH):
+            parts.append(_embeddings(batch.column("embedding")))
+            rows += batch.num_rows
+            if rows >= args.rows:
+                break
+        vectors = np.concatenate(parts)[: args.rows]
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def shorten(vectors: np.ndarray, width: int) -> np.ndarray:
+    short = np.ascontiguousarray(vectors[:, :width])
+    return short / np.linalg.norm(short, axis=1, keepdims=True)
+
+
+def directory_mb(path: str) -> float:
+    return sum(
+        os.path.getsize(os.path.join(root, name)) for root, _, names in os.walk(path) for name in names
+    ) / 1e6
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--snapshot", help="Arrow/Parquet snapshot to take embeddings from")
+    parser.add_argument("--rows", type=int, default=50_000)
+    parser.add_argument("--widths", type=int, nargs="+", default=[256, 512, 1536])
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--top-k", type=int, default=3)
+    parser.add_argument("--stores", nargs="+", default=["numpy", "chroma"], choices=["numpy", "chroma"])
+    args = parser.parse_args()
+
+    vectors = load_vectors(args)
+    # Held-out queries near stored vectors, like a question near its chunks
+    rng = np.random.default_rng(1)
+    picks = rng.choice(len(vectors), args.queries, replace=False)
+    queries = vectors[picks] + rng.normal(0, 0.05, vectors[picks].shape).astype(np.float32)
+    queries /= np.linalg.norm(queries, axis=1, keepdims=True)
+    truth = np.argpartition(-(queries @ vectors.T), args.top_k - 1, axis=1)[:, : args.top_k]
+    print(f"{len(vectors)} vectors, {args.queries} queries, recall@{args.top_k} against full width")
+
+    print(
+        f"{'store':<7} {'width':>6} {'vectors MB':>11} {'index MB':>9} {'build s':>8} "
+        f"{'recall':>7} {'p50 ms':>7} {'p95 ms':>7}"
+    )
+    for store_name in args.stores:
+        for width in args.widths:
+            short = shorten(vectors, width)
+            short_queries = shorten(queries, width)
+            with tempfile.TemporaryDirectory() as tmp:
+                if store_name == "numpy":
+                    store = NumpyVectorStore(tmp, metadata={"embedding_dimensions": width})
+                else:
+                    client = chromadb.PersistentClient(path=tmp, settings=Settings(anonymized_telemetry=False))
+                    store = client.create_collection("documents", metadata={"embedding_dimensions": width})
+                started = time.perf_counter()
+                for first in range(0, len(short), BUILD_BATCH):
+                    part = short[first : first + BUILD_BATCH]
+                    store.add(
+                        ids=[f"bench_{first + i}" for i in range(len(part))],
+                        embeddings=part,
+                        metadatas=[{"source": "bench", "chunk_index": first + i} for i in range(len(part))],
+                        documents=["DocuQuest embedding width benchmark chunk."] * len(part),
+                    )
+                built = time.perf_counter() - started
+
+                latencies = []
+                hits = 0
+                for query, expected in zip(short_queries, truth):
+                    started = time.perf_counter()
+                    result = store.query(query_embeddings=[query], n_results=args.top_k)
+                    latencies.append((time.perf_counter() - started) * 1000)
+                    found = {int(i.rsplit("_", 1)[1]) for i in result["ids"][0]}
+                    hits += len(found & set(expected.tolist()))
+                latencies.sort()
+                print(
+                    f"{store_name:<7} {width:>6} {short.nbytes / 1e6:>11.0f} {directory_mb(tmp):>9.0f} "
+                    f"{built:>8.1f} {hits / truth.size:>7.3f} {statistics.median(latencies):>7.2f} "
+                    f"{latencies[int(len(latencies) * 0.95) - 1]:>7.2f}"
+                )
+
+
+if __name__ == "__main__":
+    main()
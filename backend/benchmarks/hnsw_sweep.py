@@ -0,0 +1,112 @@
+"""
+HNSW recall and latency sweep over M, construction ef and ef_search.
+
+Builds one in-memory collection per (M, construction ef) from a snapshot's
+embeddings (GET /export?format=arrow, or Parquet) or from random unit
+vectors, then for each ef_search runs held-out queries the way /query does
+and compares the ids against exact brute-force top-k. Run from backend/:
+
+    python -m benchmarks.hnsw_sweep --snapshot index.arrow --m 16 32 --construction-ef 100 200 \\
+        --ef-search 10 50 100 200 --top-k 3
+"""
+import argparse
+import statistics
+import time
+
+import chromadb
+import numpy as np
+from chromadb.config import Settings
+
+from snapshots import _embeddings, read_snapshot
+
+BUILD_BATCH = 5000
+
+
+def load_vectors(args) -> np.ndarray:
+    if not args.snapshot:
+        rng = np.random.default_rng(0)
+        vectors = rng.standard_normal((args.rows, args.dimensions), dtype=np.float32)
+    else:
+        parts = []
+        rows = 0
+        for batch in read_snapshot(args.snapshot, BUILD_BATCH):
+            parts.append(_embeddings(batch.column("embedding")))
+            rows += batch.num_rows
+            if rows >= args.rows:
+                break
+        vectors = np.concatenate(parts)[: args.rows]
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def exact_top_k(corpus: np.ndarray, queries: np.ndarray, k: int) -> np.ndarray:
+    # Unit vectors: cosine, inner product and l2 all rank by the dot product
+    scores = queries @ corpus.T
+    top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    order = np.take_along_axis(scores, top, axis=1).argsort(axis=1)[:, ::-1]
+    return np.take_along_axis(top, order, axis=1)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--snapshot", help="Arrow/Parquet snapshot to take embeddings from")
+    parser.add_argument("--rows", type=int, default=50_000)
+    parser.add_argument("--dimensions", type=int, default=1536, help="For random vectors")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--space", default="cosine", choices=["cosine", "l2", "ip"])
+    parser.add_argument("--m", type=int, nargs="+", default=[16, 32])
+    parser.add_argument("--construction-ef", type=int, nargs="+", default=[100, 200])
+    parser.add_argument("--ef-search", type=int, nargs="+", default=[10, 25, 50, 100, 200])
+    parser.add_argument("--top-k", type=int, default=3)
+    args = parser.parse_args()
+
+    vectors = load_vectors(args)
+    # Held-out queries: nearby but not identical to stored vectors, like a question near its chunks
+    rng = np.random.default_rng(1)
+    picks = rng.choice(len(vectors), args.queries, replace=False)
+    queries = vectors[picks] + rng.normal(0, 0.05, (args.queries, vectors.shape[1])).astype(np.float32)
+    queries /= np.linalg.norm(queries, axis=1, keepdims=True)
+    truth = exact_top_k(vectors, queries, args.top_k)
+    ids = [str(i) for i in range(len(vectors))]
+    print(f"{len(vectors)} vectors x {vectors.shape[1]}, {args.queries} queries, recall@{args.top_k}, space={args.space}")
+
+    client = chromadb.Client(Settings(anonymized_telemetry=False))
+    print(f"{'M':>4} {'c_ef':>5} {'build s':>8} {'ef':>5} {'recall':>7} {'p50 ms':>7} {'p95 ms':>7}")
+    for m in args.m:
+        for construction_ef in args.construction_ef:
+            name = f"sweep-{m}-{construction_ef}"
+            # The collection's search ef is the floor for every query, so start it at the narrowest swept
+            collection = client.create_collection(
+                name,
+                metadata={
+                    "hnsw:space": args.space,
+                    "hnsw:M": m,
+                    "hnsw:construction_ef": construction_ef,
+                    "hnsw:search_ef": min(args.ef_search),
+                },
+            )
+            started = time.perf_counter()
+            for first in range(0, len(vectors), BUILD_BATCH):
+                collection.add(ids=ids[first : first + BUILD_BATCH], embeddings=vectors[first : first + BUILD_BATCH])
+            built = time.perf_counter() - started
+
+            for ef in args.ef_search:
+                # Same widening as /query: hnswlib searches with max(ef, n_results)
+                n_results = max(args.top_k, ef)
+                latencies = []
+                hits = 0
+                for query, expected in zip(queries, truth):
+                    started = time.perf_counter()
+                    result = collection.query(query_embeddings=[query], n_results=n_results, include=["distances"])
+                    latencies.append((time.perf_counter() - started) * 1000)
+                    found = {int(i) for i in result["ids"][0][: args.top_k]}
+                    hits += len(found & set(expected.tolist()))
+                latencies.sort()
+                print(
+                    f"{m:>4} {construction_ef:>5} {built:>8.1f} {ef:>5} {hits / truth.size:>7.3f} "
+                    f"{statistics.median(latencies):>7.2f} {latencies[int(len(latencies) * 0.95) - 1]:>7.2f}"
+                )
+            client.delete_collection(name)
+
+
+if __name__ == "__main__":
+    main()
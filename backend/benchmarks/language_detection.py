@@ -0,0 +1,62 @@
+"""
+Language detection: langdetect vs the n-gram detector, per segment.
+
+Cuts a document into the same segments ingestion translates, detects each
+one with both, and prints throughput and how often they agree. Run from
+backend/:
+
+    python -m benchmarks.language_detection document_fr.txt
+"""
+import argparse
+import time
+from collections import Counter
+
+from benchmarks._scratch import use_scratch_state
+
+use_scratch_state()
+
+from langdetect import DetectorFactory, detect  # noqa: E402
+
+from chunking import chunk_text  # noqa: E402
+from main import TRANSLATION_SEGMENT_TOKENS, detect_languages, get_language_detector  # noqa: E402
+
+
+def langdetect_or_unknown(text: str) -> str:
+    try:
+        return detect(text)
+    except Exception:
+        return "unknown"
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("document", help="UTF-8 text file")
+    parser.add_argument("--segment-tokens", type=int, default=TRANSLATION_SEGMENT_TOKENS)
+    args = parser.parse_args()
+
+    with open(args.document, encoding="utf-8") as f:
+        segments = [c.text for c in chunk_text(f.read(), args.segment_tokens, overlap_tokens=0)]
+
+    started = time.perf_counter()
+    get_language_detector()
+    print(f"{len(segments)} segments; n-gram profiles loaded in {time.perf_counter() - started:.2f}s")
+
+    DetectorFactory.seed = 0
+    results = {}
+    print(f"{'detector':<10} {'s':>7} {'segments/s':>11}  languages")
+    for name, run in (
+        ("langdetect", lambda: [langdetect_or_unknown(s[:2000]) for s in segments]),
+        ("ngram", lambda: detect_languages(segments)),
+    ):
+        started = time.perf_counter()
+        results[name] = run()
+        elapsed = time.perf_counter() - started
+        common = ", ".join(f"{lang}={n}" for lang, n in Counter(results[name]).most_common(5))
+        print(f"{name:<10} {elapsed:>7.2f} {len(segments) / elapsed:>11.1f}  {common}")
+
+    agree = sum(a == b for a, b in zip(results["langdetect"], results["ngram"]))
+    print(f"agreement: {agree}/{len(segments)}")
+
+
+if __name__ == "__main__":
+    main()
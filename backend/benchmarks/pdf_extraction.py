@@ -0,0 +1,55 @@
+"""
+PDF extraction throughput (pages/second) against process pool size.
+
+Run from backend/ with any reasonably large PDF:
+
+    python -m benchmarks.pdf_extraction big.pdf --workers 1 2 4 8
+"""
+import argparse
+import asyncio
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from pdf_extract import iter_pdf_pages
+
+
+async def timed_extract(path: str, workers: int) -> tuple:
+    # Same dispatch as main.get_pdf_pool(): one worker means the thread pool,
+    # and workers are spawned rather than forked
+    pool = (
+        ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+        if workers > 1
+        else None
+    )
+    try:
+        if pool is not None:
+            # Spin the workers up outside the timed region
+            await asyncio.gather(*(asyncio.get_running_loop().run_in_executor(pool, int) for _ in range(workers)))
+        start = time.perf_counter()
+        pages = 0
+        async for _ in iter_pdf_pages(path, pool, workers):
+            pages += 1
+        return pages, time.perf_counter() - start
+    finally:
+        if pool is not None:
+            pool.shutdown()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("pdf")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"{'workers':>8} {'pages':>7} {'best s':>8} {'pages/s':>9}")
+    for workers in args.workers:
+        runs = [asyncio.run(timed_extract(args.pdf, workers)) for _ in range(args.repeat)]
+        pages = runs[0][0]
+        best = min(elapsed for _, elapsed in runs)
+        print(f"{workers:>8} {pages:>7} {best:>8.2f} {pages / best:>9.1f}")
+
+
+if __name__ == "__main__":
+    main()
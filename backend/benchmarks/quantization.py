@@ -0,0 +1,99 @@
+"""
+Quantized scans with full-precision re-ranking: memory, latency and recall.
+
+Builds one numpy store from a snapshot's embeddings (GET /export?format=arrow,
+or Parquet) or from random unit vectors, then reopens it with each
+quantization, which derives the codes from the stored matrix. For each
+number of re-rank candidates it runs held-out queries the way /query does
+and compares the ids against exact top-k. "scan MB" is what a query reads
+for every row: the float32 matrix, or the codes. Run from backend/:
+
+    python -m benchmarks.quantization --rows 100000 --dimensions 1536 --candidates 10 50 100 400
+"""
+import argparse
+import statistics
+import tempfile
+import time
+
+import numpy as np
+
+from snapshots import _embeddings, read_snapshot
+from vector_store import NumpyVectorStore
+
+BUILD_BATCH = 5000
+
+
+def load_vectors(args) -> np.ndarray:
+    if not args.snapshot:
+        rng = np.random.default_rng(0)
+        vectors = rng.standard_normal((args.rows, args.dimensions), dtype=np.float32)
+    else:
+        parts = []
+        rows = 0
+        for batch in read_snapshot(args.snapshot, BUILD_BATCH):
+            parts.append(_embeddings(batch.column("embedding")))
+            rows += batch.num_rows
+            if rows >= args.rows:
+                break
+        vectors = np.concatenate(parts)[: args.rows]
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--snapshot", help="Arrow/Parquet snapshot to take embeddings from")
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--dimensions", type=int, default=1536, help="For random vectors")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--top-k", type=int, default=3)
+    parser.add_argument("--candidates", type=int, nargs="+", default=[10, 50, 100, 400])
+    args = parser.parse_args()
+
+    vectors = load_vectors(args)
+    # Held-out queries near stored vectors, like a question near its chunks
+    rng = np.random.default_rng(1)
+    picks = rng.choice(len(vectors), args.queries, replace=False)
+    queries = vectors[picks] + rng.normal(0, 0.05, (args.queries, vectors.shape[1])).astype(np.float32)
+    queries /= np.linalg.norm(queries, axis=1, keepdims=True)
+    truth = np.argpartition(-(queries @ vectors.T), args.top_k - 1, axis=1)[:, : args.top_k]
+    print(f"{len(vectors)} vectors x {vectors.shape[1]}, {args.queries} queries, recall@{args.top_k}")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        store = NumpyVectorStore(tmp)
+        for first in range(0, len(vectors), BUILD_BATCH):
+            part = vectors[first : first + BUILD_BATCH]
+            store.add(
+                ids=[f"bench_{first + i}" for i in range(len(part))],
+                embeddings=part,
+                metadatas=[{"source": "bench", "chunk_index": first + i} for i in range(len(part))],
+                documents=["DocuQuest quantization benchmark chunk."] * len(part),
+            )
+        del store
+
+        print(f"{'codes':<7} {'scan MB':>8} {'encode s':>9} {'rerank':>7} {'recall':>7} {'p50 ms':>7} {'p95 ms':>7}")
+        for quantization in [None, "int8", "binary"]:
+            started = time.perf_counter()
+            store = NumpyVectorStore(tmp, quantization=quantization)
+            encoded = time.perf_counter() - started
+            scanned = store._matrix if store._codes is None else store._codes
+            for candidates in args.candidates if quantization else [0]:
+                store.rerank_candidates = candidates
+                latencies = []
+                hits = 0
+                for query, expected in zip(queries, truth):
+                    started = time.perf_counter()
+                    result = store.query(query_embeddings=[query], n_results=args.top_k)
+                    latencies.append((time.perf_counter() - started) * 1000)
+                    found = {int(i.rsplit("_", 1)[1]) for i in result["ids"][0]}
+                    hits += len(found & set(expected.tolist()))
+                latencies.sort()
+                print(
+                    f"{quantization or 'float32':<7} {scanned.nbytes / 1e6:>8.0f} {encoded:>9.1f} "
+                    f"{candidates or '-':>7} {hits / truth.size:>7.3f} "
+                    f"{statistics.median(latencies):>7.2f} {latencies[int(len(latencies) * 0.95) - 1]:>7.2f}"
+                )
+            del store
+
+
+if __name__ == "__main__":
+    main()
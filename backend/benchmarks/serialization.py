@@ -0,0 +1,121 @@
+"""
+Response serialization time vs response size, per encoder.
+
+Builds /upload?detail=chunks responses of increasing size and times the
+default FastAPI path (validate against the response model, then json.dumps)
+against the negotiated encoders, which take the handler's dicts as they
+are. The float-list row is the response shape from before embeddings were
+packed as bytes. Run from backend/:
+
+    python -m benchmarks.serialization --chunks 10 100 1000
+"""
+import argparse
+import base64
+import json
+import time
+from typing import List
+
+import numpy as np
+
+from benchmarks._scratch import use_scratch_state
+
+use_scratch_state()
+
+from pydantic import BaseModel  # noqa: E402
+
+from main import UploadResponse  # noqa: E402
+from serialization import dumps_json, dumps_msgpack, msgpack, orjson  # noqa: E402
+
+
+class FloatListChunk(BaseModel):
+    chunk_index: int
+    text: str
+    original_language: str
+    embedding: List[float]
+
+
+class FloatListResponse(BaseModel):
+    filename: str
+    total_chunks: int
+    chunks: List[FloatListChunk]
+    deduplicated: bool = False
+
+
+def make_response(chunks: int, dimensions: int) -> dict:
+    rng = np.random.default_rng(0)
+    return {
+        "filename": "bench.pdf",
+        "total_chunks": chunks,
+        "original_language": "en",
+        "translated": False,
+        "deduplicated": False,
+        "chunks_reused": 0,
+        "chunks_removed": 0,
+        "timings": {"reading": 0.1, "embedding": 1.0},
+        "embedding_dtype": "float32",
+        "chunks": [
+            {
+                "chunk_index": i,
+                "text": "DocuQuest serialization benchmark sentence. " * 22,
+                "original_language": "en",
+                "embedding": rng.standard_normal(dimensions, dtype=np.float32).tobytes(),
+            }
+            for i in range(chunks)
+        ],
+    }
+
+
+def fastapi_default(model, content: dict) -> bytes:
+    # What FastAPI does with a returned dict: validate, dump, then json.dumps in JSONResponse
+    dumped = model.model_validate(content).model_dump(mode="json")
+    return json.dumps(dumped, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def timed(encode, content: dict, repeat: int):
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        body = encode(content)
+        best = min(best, time.perf_counter() - started)
+    return body, best
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--chunks", type=int, nargs="+", default=[10, 100, 1000])
+    parser.add_argument("--dimensions", type=int, default=1536)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"orjson: {'yes' if orjson else 'no (stdlib json)'}, msgpack: {'yes' if msgpack else 'no'}")
+    print(f"{'encoder':<30} {'chunks':>7} {'MB':>8} {'ms':>9} {'MB/s':>8}")
+    for chunks in args.chunks:
+        content = make_response(chunks, args.dimensions)
+        as_base64 = {
+            **content,
+            "chunks": [
+                {**c, "embedding": base64.b64encode(c["embedding"]).decode("ascii")} for c in content["chunks"]
+            ],
+        }
+        as_floats = {
+            **content,
+            "chunks": [
+                {**c, "embedding": np.frombuffer(c["embedding"], dtype=np.float32).tolist()}
+                for c in content["chunks"]
+            ],
+        }
+        runs = [
+            ("fastapi default, float lists", lambda c: fastapi_default(FloatListResponse, c), as_floats),
+            ("fastapi default, base64", lambda c: fastapi_default(UploadResponse, c), as_base64),
+            ("orjson, bytes as base64", dumps_json, content),
+        ]
+        if msgpack is not None:
+            runs.append(("msgpack, bytes as bin", dumps_msgpack, content))
+        for name, encode, payload in runs:
+            body, seconds = timed(encode, payload, args.repeat)
+            mb = len(body) / 1e6
+            print(f"{name:<30} {chunks:>7} {mb:>8.2f} {seconds * 1000:>9.1f} {mb / seconds:>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+"""
+Snapshot load time: decoding alone vs a full import into the vector store.
+
+Writes a synthetic snapshot (random unit vectors, chunk-sized documents and
+metadata shaped like ingestion's) as Parquet and as an Arrow IPC stream,
+then loads each into a fresh store the way the startup import does: a
+Chroma collection, or with --store numpy a NumpyVectorStore. The Chroma
+store is in memory unless --path gives a directory for a persistent one
+(an in-memory store needs RAM for the documents too); the numpy store is
+always on disk, in --path or a temp directory. Run from backend/:
+
+    python -m benchmarks.snapshot_import --rows 100000 1000000 --dimensions 1536 --store numpy
+"""
+import argparse
+import json
+import os
+import shutil
+import tempfile
+import time
+
+import chromadb
+import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
+from chromadb.config import Settings
+
+from snapshots import _embeddings, arrow_schema, import_snapshot, read_snapshot
+from vector_store import NumpyVectorStore
+
+WRITE_BATCH = 10_000
+
+
+def snapshot_batches(rows: int, dimensions: int):
+    rng = np.random.default_rng(0)
+    schema = arrow_schema(dimensions)
+    document = "DocuQuest snapshot benchmark sentence. " * 20
+    for first in range(0, rows, WRITE_BATCH):
+        n = min(WRITE_BATCH, rows - first)
+        vectors = rng.standard_normal((n, dimensions), dtype=np.float32)
+        vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+        metadatas = [
+            json.dumps({
+                "source": f"doc{(first + i) // 1000}.pdf",
+                "chunk_index": (first + i) % 1000,
+                "original_language": "en",
+                "translated": False,
+                "start": 0,
+                "end": len(document),
+                "span_start": 0,
+            })
+            for i in range(n)
+        ]
+        yield pa.record_batch(
+            [
+                pa.array([f"bench_{first + i}" for i in range(n)]),
+                pa.array([document] * n),
+                pa.array(metadatas),
+                pa.FixedSizeListArray.from_arrays(pa.array(vectors.reshape(-1)), dimensions),
+            ],
+            schema=schema,
+        )
+
+
+def write_snapshot(path: str, rows: int, dimensions: int) -> None:
+    schema = arrow_schema(dimensions)
+    if path.endswith(".parquet"):
+        with pq.ParquetWriter(path, schema) as writer:
+            for batch in snapshot_batches(rows, dimensions):
+                writer.write_batch(batch)
+    else:
+        with pa.OSFile(path, "wb") as sink, pa.ipc.new_stream(sink, schema) as writer:
+            for batch in snapshot_batches(rows, dimensions):
+                writer.write_batch(batch)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, nargs="+", default=[100_000, 1_000_000])
+    parser.add_argument("--dimensions", type=int, default=1536)
+    parser.add_argument("--batch-size", type=int, default=5000)
+    parser.add_argument("--formats", nargs="+", default=["arrow", "parquet"], choices=["arrow", "parquet"])
+    parser.add_argument("--path", help="Import into a persistent store in this directory")
+    parser.add_argument("--store", default="chroma", choices=["chroma", "numpy"])
+    args = parser.parse_args()
+
+    client = None
+    batch_size = args.batch_size
+    if args.store == "chroma":
+        settings = Settings(anonymized_telemetry=False)
+        if args.path:
+            client = chromadb.PersistentClient(path=args.path, settings=settings)
+        else:
+            client = chromadb.Client(settings)
+        batch_size = min(batch_size, client.get_max_batch_size())
+    print(f"{args.store} store, {args.dimensions} dimensions, import batches of {batch_size}")
+    print(f"{'format':<8} {'rows':>9} {'file MB':>9} {'decode s':>9} {'import s':>9} {'rows/s':>9}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for rows in args.rows:
+            for fmt in args.formats:
+                path = os.path.join(tmp, f"snapshot-{rows}.{fmt}")
+                write_snapshot(path, rows, args.dimensions)
+
+                started = time.perf_counter()
+                for batch in read_snapshot(path, batch_size):
+                    _embeddings(batch.column("embedding"))
+                    [json.loads(md) for md in batch.column("metadata").to_pylist()]
+                decoded = time.perf_counter() - started
+
+                name = f"bench-{fmt}-{rows}"
+                if client is None:
+                    store_path = os.path.join(args.path or tmp, name)
+                    collection = NumpyVectorStore(store_path)
+                else:
+                    collection = client.create_collection(name)
+                started = time.perf_counter()
+                loaded = import_snapshot(collection, path, batch_size)
+                imported = time.perf_counter() - started
+                assert loaded == rows == collection.count()
+                if client is None:
+                    del collection
+                    shutil.rmtree(store_path)
+                else:
+                    client.delete_collection(name)
+
+                print(
+                    f"{fmt:<8} {rows:>9} {os.path.getsize(path) / 1e6:>9.0f} "
+                    f"{decoded:>9.1f} {imported:>9.1f} {rows / imported:>9.0f}"
+                )
+                os.remove(path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""
+Ingestion cost and latency: translate-then-embed vs embedding the original text.
+
+Runs the real pipeline (real OpenAI calls, so OPENAI_API_KEY must be set)
+on one non-English document per mode, with fresh caches and a scratch vector
+store in a temp directory. Token counts are the scheduler's admitted
+estimates; for chat calls they include the full output budget, so chat cost
+is an upper bound. Run from backend/:
+
+    python -m benchmarks.translation_modes document_fr.pdf
+"""
+import argparse
+import asyncio
+import hashlib
+import os
+import time
+
+from benchmarks._scratch import use_scratch_state
+
+# Fresh caches and a scratch store, so neither mode is served from earlier
+# runs and the live store under backend/ is left alone
+use_scratch_state(offline=False)
+
+import main  # noqa: E402
+
+
+async def ingest(path: str, translate: bool) -> tuple:
+    mode = "translate" if translate else "original"
+    ext = path.lower().split(".")[-1]
+    with open(path, "rb") as f:
+        digest = hashlib.sha256(f.read()).hexdigest()
+    before = {model: dict(u) for model, u in main.openai_scheduler.usage.items()}
+
+    job = main.IngestJob(filename=f"{mode}-{os.path.basename(path)}")
+    start = time.perf_counter()
+    with open(path, "rb") as f:
+        # Distinct digest per mode, or the second run would be deduplicated
+        summary = await main.ingest_document(f, job.filename, ext, f"{digest}-{mode}", job, translate)
+    elapsed = time.perf_counter() - start
+
+    usage = {}
+    for model, counts in main.openai_scheduler.usage.items():
+        prior = before.get(model, {"requests": 0, "tokens": 0})
+        usage[model] = {k: counts[k] - prior[k] for k in counts}
+    return mode, summary, elapsed, usage
+
+
+def main_() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("document")
+    parser.add_argument("--embedding-price", type=float, default=0.02, help="USD per 1M embedding tokens")
+    parser.add_argument("--chat-price", type=float, default=1.0, help="USD per 1M chat tokens (blended)")
+    args = parser.parse_args()
+
+    async def run():
+        return [await ingest(args.document, translate) for translate in (True, False)]
+
+    prices = {main.EMBEDDING_MODEL: args.embedding_price, main.CHAT_MODEL: args.chat_price}
+    print(f"{'mode':<10} {'lang':>5} {'chunks':>7} {'seconds':>8} {'requests':>9} {'tokens':>9} {'est. USD':>9}")
+    for mode, summary, elapsed, usage in asyncio.run(run()):
+        requests = sum(u["requests"] for u in usage.values())
+        tokens = sum(u["tokens"] for u in usage.values())
+        cost = sum(u["tokens"] / 1e6 * prices.get(model, 0.0) for model, u in usage.items())
+        print(
+            f"{mode:<10} {summary['original_language']:>5} {summary['total_chunks']:>7} "
+            f"{elapsed:>8.2f} {requests:>9} {tokens:>9} {cost:>9.4f}"
+        )
+
+
+if __name__ == "__main__":
+    main_()
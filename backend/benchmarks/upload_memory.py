@@ -0,0 +1,107 @@
+"""
+Peak RSS of N concurrent uploads: buffered (read + BytesIO) vs disk spool.
+
+Each mode runs in a fresh subprocess so ru_maxrss is not shared between them.
+Run from backend/:
+
+    python -m benchmarks.upload_memory --uploads 8 --size-mb 50
+"""
+import argparse
+import asyncio
+import io
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+
+from benchmarks._scratch import use_scratch_state
+
+
+def peak_rss_mb() -> float:
+    # ru_maxrss is reported in kilobytes on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def make_payload(path: str, size_mb: int) -> None:
+    line = b"DocuQuest upload memory benchmark payload line.\n"
+    with open(path, "wb") as f:
+        remaining = size_mb * 1024 * 1024
+        block = line * (1024 * 1024 // len(line))
+        while remaining > 0:
+            f.write(block[:remaining])
+            remaining -= len(block)
+
+
+async def ingest_buffered(upload) -> int:
+    contents = await upload.read()
+    stream = io.BytesIO(contents)
+    return len(stream.getbuffer())
+
+
+async def ingest_spooled(upload) -> int:
+    from main import spool_upload
+
+    spool, _ = await spool_upload(upload)
+    with spool:
+        return os.fstat(spool.fileno()).st_size
+
+
+def run_worker(mode: str, payload: str, uploads: int) -> None:
+    # Keep main's store and caches next to the payload, so they go with it
+    use_scratch_state(os.path.join(os.path.dirname(payload), mode))
+    from starlette.datastructures import UploadFile
+
+    import main  # noqa: F401  (import cost is part of the baseline)
+
+    baseline = peak_rss_mb()
+    ingest = ingest_buffered if mode == "buffered" else ingest_spooled
+
+    async def run():
+        files = [UploadFile(file=open(payload, "rb"), filename="bench.txt") for _ in range(uploads)]
+        try:
+            return await asyncio.gather(*(ingest(f) for f in files))
+        finally:
+            for f in files:
+                f.file.close()
+
+    sizes = asyncio.run(run())
+    print(json.dumps({
+        "mode": mode,
+        "bytes": sum(sizes),
+        "baseline_mb": round(baseline, 1),
+        "peak_mb": round(peak_rss_mb(), 1),
+    }))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--uploads", type=int, default=4)
+    parser.add_argument("--size-mb", type=int, default=50)
+    parser.add_argument("--worker", choices=("buffered", "spooled"))
+    parser.add_argument("--payload")
+    args = parser.parse_args()
+
+    if args.worker:
+        run_worker(args.worker, args.payload, args.uploads)
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        payload = os.path.join(tmp, "payload.txt")
+        make_payload(payload, args.size_mb)
+        print(f"{args.uploads} concurrent uploads of {args.size_mb} MB")
+        print(f"{'mode':<10} {'baseline MB':>12} {'peak MB':>10} {'delta MB':>10}")
+        for mode in ("buffered", "spooled"):
+            out = subprocess.run(
+                [sys.executable, "-m", "benchmarks.upload_memory", "--worker", mode,
+                 "--payload", payload, "--uploads", str(args.uploads)],
+                check=True, capture_output=True, text=True,
+            ).stdout
+            r = json.loads(out.strip().splitlines()[-1])
+            print(f"{mode:<10} {r['baseline_mb']:>12} {r['peak_mb']:>10} "
+                  f"{r['peak_mb'] - r['baseline_mb']:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
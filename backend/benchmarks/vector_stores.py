@@ -0,0 +1,102 @@
+"""
+Exact NumPy store vs Chroma's HNSW: build time, query latency and recall.
+
+Builds both stores on disk from the same random unit vectors, with
+chunk-sized documents and metadata, then runs held-out queries the way
+/query does (top-k with metadatas and documents) and compares the ids
+against exact brute-force top-k. Run from backend/:
+
+    python -m benchmarks.vector_stores --rows 10000 50000 100000 --dimensions 1536
+"""
+import argparse
+import os
+import statistics
+import tempfile
+import time
+
+import chromadb
+import numpy as np
+from chromadb.config import Settings
+
+from vector_store import NumpyVectorStore
+
+BUILD_BATCH = 5000
+
+
+def directory_mb(path: str) -> float:
+    return sum(
+        os.path.getsize(os.path.join(root, name)) for root, _, names in os.walk(path) for name in names
+    ) / 1e6
+
+
+def build(store, vectors: np.ndarray) -> float:
+    document = "DocuQuest vector store benchmark sentence. " * 20
+    started = time.perf_counter()
+    for first in range(0, len(vectors), BUILD_BATCH):
+        part = vectors[first : first + BUILD_BATCH]
+        store.add(
+            ids=[f"bench_{first + i}" for i in range(len(part))],
+            embeddings=part,
+            metadatas=[
+                {"source": f"doc{(first + i) // 1000}.pdf", "chunk_index": (first + i) % 1000}
+                for i in range(len(part))
+            ],
+            documents=[document] * len(part),
+        )
+    return time.perf_counter() - started
+
+
+def run_queries(store, queries: np.ndarray, truth: np.ndarray, top_k: int):
+    latencies = []
+    hits = 0
+    for query, expected in zip(queries, truth):
+        started = time.perf_counter()
+        result = store.query(query_embeddings=[query], n_results=top_k, include=["metadatas", "documents"])
+        latencies.append((time.perf_counter() - started) * 1000)
+        found = {int(i.rsplit("_", 1)[1]) for i in result["ids"][0]}
+        hits += len(found & set(expected.tolist()))
+    latencies.sort()
+    return hits / truth.size, statistics.median(latencies), latencies[int(len(latencies) * 0.95) - 1]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, nargs="+", default=[10_000, 50_000, 100_000])
+    parser.add_argument("--dimensions", type=int, default=1536)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--top-k", type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"{args.dimensions} dimensions, {args.queries} queries, recall@{args.top_k}")
+    print(f"{'store':<7} {'rows':>8} {'build s':>8} {'disk MB':>8} {'recall':>7} {'p50 ms':>7} {'p95 ms':>7}")
+    for rows in args.rows:
+        rng = np.random.default_rng(0)
+        vectors = rng.standard_normal((rows, args.dimensions), dtype=np.float32)
+        vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+        # Held-out queries near stored vectors, like a question near its chunks
+        picks = rng.choice(rows, args.queries, replace=False)
+        queries = vectors[picks] + rng.normal(0, 0.05, (args.queries, args.dimensions)).astype(np.float32)
+        queries /= np.linalg.norm(queries, axis=1, keepdims=True)
+        scores = queries @ vectors.T
+        truth = np.argpartition(-scores, args.top_k - 1, axis=1)[:, : args.top_k]
+        del scores
+
+        with tempfile.TemporaryDirectory() as tmp:
+            client = chromadb.PersistentClient(
+                path=os.path.join(tmp, "chroma"), settings=Settings(anonymized_telemetry=False)
+            )
+            stores = [
+                ("numpy", NumpyVectorStore(os.path.join(tmp, "numpy")), os.path.join(tmp, "numpy")),
+                ("chroma", client.create_collection("documents"), os.path.join(tmp, "chroma")),
+            ]
+            for name, store, path in stores:
+                built = build(store, vectors)
+                recall, p50, p95 = run_queries(store, queries, truth, args.top_k)
+                print(
+                    f"{name:<7} {rows:>8} {built:>8.1f} {directory_mb(path):>8.0f} "
+                    f"{recall:>7.3f} {p50:>7.2f} {p95:>7.2f}"
+                )
+
+
+if __name__ == "__main__":
+    main()
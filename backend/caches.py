@@ -0,0 +1,131 @@
+"""
+SQLite-backed LRU caches for provider results.
+
+Entries are keyed by (namespace, key): the namespace pins everything that
+changes the result (e.g. the model name) and the key is a hash of the
+normalized input text.
+"""
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+import unicodedata
+from typing import Dict, Iterable, List
+
+import numpy as np
+
+# SQLite's default limit on bound parameters is 999
+_SQL_BATCH = 500
+
+
+def normalize_text(text: str) -> str:
+    return " ".join(unicodedata.normalize("NFC", text).split())
+
+
+def text_key(text: str) -> str:
+    return hashlib.sha256(normalize_text(text).encode("utf-8")).hexdigest()
+
+
+class SQLiteLRUCache:
+    """
+    Persistent key/value cache bounded to `max_entries`, evicting the least
+    recently used entries first. Counts hits, misses and evictions since the
+    process started.
+    """
+
+    def __init__(self, path: str, max_entries: int):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        with self._db:
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS entries ("
+                " namespace TEXT NOT NULL,"
+                " key TEXT NOT NULL,"
+                " value BLOB NOT NULL,"
+                " last_used REAL NOT NULL,"
+                " PRIMARY KEY (namespace, key))"
+            )
+            self._db.execute("CREATE INDEX IF NOT EXISTS entries_last_used ON entries (last_used)")
+
+    def _encode(self, value):
+        return value
+
+    def _decode(self, value):
+        return value
+
+    def get_many(self, namespace: str, keys: Iterable[str]) -> Dict[str, object]:
+        """
+        Look up `keys` and return the ones present. Duplicate keys are looked
+        up (and counted) once.
+        """
+        unique = list(dict.fromkeys(keys))
+        found = {}
+        with self._lock:
+            for i in range(0, len(unique), _SQL_BATCH):
+                part = unique[i : i + _SQL_BATCH]
+                rows = self._db.execute(
+                    f"SELECT key, value FROM entries WHERE namespace = ? AND key IN ({','.join('?' * len(part))})",
+                    (namespace, *part),
+                )
+                found.update(rows)
+            if found:
+                now = time.time()
+                with self._db:
+                    self._db.executemany(
+                        "UPDATE entries SET last_used = ? WHERE namespace = ? AND key = ?",
+                        [(now, namespace, key) for key in found],
+                    )
+            self.hits += len(found)
+            self.misses += len(unique) - len(found)
+        return {key: self._decode(value) for key, value in found.items()}
+
+    def put_many(self, namespace: str, items: Dict[str, object]) -> None:
+        if not items:
+            return
+        now = time.time()
+        with self._lock, self._db:
+            self._db.executemany(
+                "INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?)",
+                [(namespace, key, self._encode(value), now) for key, value in items.items()],
+            )
+            excess = self._count() - self.max_entries
+            if excess > 0:
+                self._db.execute(
+                    "DELETE FROM entries WHERE rowid IN"
+                    " (SELECT rowid FROM entries ORDER BY last_used LIMIT ?)",
+                    (excess,),
+                )
+                self.evictions += excess
+
+    def _count(self) -> int:
+        return self._db.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            entries = self._count()
+        lookups = self.hits + self.misses
+        return {
+            "entries": entries,
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+        }
+
+
+class EmbeddingCache(SQLiteLRUCache):
+    """Embedding vectors, stored as raw float32 bytes."""
+
+    def _encode(self, value: List[float]) -> bytes:
+        return np.asarray(value, dtype=np.float32).tobytes()
+
+    def _decode(self, value: bytes) -> List[float]:
+        return np.frombuffer(value, dtype=np.float32).tolist()
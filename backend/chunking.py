@@ -0,0 +1,320 @@
+"""
+Token-measured, sentence-aligned chunking of document text.
+
+Kept out of main.py so the chunker can be used and tested without starting
+the app (which opens the vector store and needs an OpenAI key).
+"""
+import os
+import zlib
+from typing import AsyncIterator, Iterable, Iterator, List, NamedTuple, Optional, Tuple, Union
+
+import regex
+from dotenv import load_dotenv
+from starlette.concurrency import run_in_threadpool
+from tokenizers import Tokenizer
+
+# Imported before main.py loads .env, and the settings below are read from it
+load_dotenv()
+
+# Chunk size and overlap between consecutive chunks, in tokens
+CHUNK_MAX_TOKENS = int(os.getenv("CHUNK_MAX_TOKENS", "256"))
+CHUNK_OVERLAP_TOKENS = int(os.getenv("CHUNK_OVERLAP_TOKENS", "48"))
+# On average one sentence in this many is a content-defined cut point (as is
+# every paragraph end), so chunk boundaries depend on the text around them
+# rather than on everything before it, and an edit only changes nearby chunks
+CHUNK_ANCHOR_PERIOD = int(os.getenv("CHUNK_ANCHOR_PERIOD", "8"))
+# Tokenizer matching the OpenAI models (cl100k_base), loaded via the tokenizers package
+# from the tokenizer.json at TOKENIZER_PATH. Only when that file is missing is
+# TOKENIZER_NAME fetched from the Hugging Face Hub, and then saved to the path,
+# so later starts don't depend on the network (offline, the Hub retries for ~25 s)
+TOKENIZER_PATH = os.getenv(
+    "TOKENIZER_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "tokenizer.json")
+)
+TOKENIZER_NAME = os.getenv("TOKENIZER_NAME", "Xenova/text-embedding-ada-002")
+
+
+_tokenizer: Optional[Tokenizer] = None
+_tokenizer_failed = False
+
+
+def get_tokenizer() -> Optional[Tokenizer]:
+    """
+    Load the tokenizer once, from TOKENIZER_PATH or else the Hub. Returns
+    None if neither works (e.g. no local file and no network access), in
+    which case count_tokens estimates.
+    """
+    global _tokenizer, _tokenizer_failed
+    if _tokenizer is None and not _tokenizer_failed:
+        if os.path.exists(TOKENIZER_PATH):
+            try:
+                _tokenizer = Tokenizer.from_file(TOKENIZER_PATH)
+                return _tokenizer
+            except Exception as e:
+                print(f"⚠️  can't read tokenizer {TOKENIZER_PATH}, trying the Hub: {e}", flush=True)
+        try:
+            _tokenizer = Tokenizer.from_pretrained(TOKENIZER_NAME)
+        except Exception as e:
+            _tokenizer_failed = True
+            print(
+                f"⚠️  tokenizer {TOKENIZER_NAME!r} unavailable, estimating token counts: {e}", flush=True
+            )
+            return None
+        try:
+            _tokenizer.save(TOKENIZER_PATH)
+        except Exception as e:
+            print(f"⚠️  can't save tokenizer to {TOKENIZER_PATH}: {e}", flush=True)
+    return _tokenizer
+
+
+def count_tokens(texts: List[str]) -> List[int]:
+    tokenizer = get_tokenizer()
+    if tokenizer is None:
+        # UTF-8 bytes / 3 overestimates English (~4 chars per token) and
+        # roughly matches CJK (3 bytes, ~1 token per character), so it is safe
+        return [len(t.encode("utf-8")) // 3 + 1 for t in texts]
+    return [len(e.ids) for e in tokenizer.encode_batch(texts, add_special_tokens=False)]
+
+
+def split_by_tokens(text: str, max_tokens: int) -> List[Tuple[str, int]]:
+    """
+    Cut `text` into consecutive pieces of at most `max_tokens` tokens,
+    returned with their token counts.
+    """
+    tokenizer = get_tokenizer()
+    if tokenizer is None:
+        # Same estimate as count_tokens: cut every (max_tokens - 1) * 3 UTF-8 bytes
+        budget = (max_tokens - 1) * 3
+        pieces = []
+        start = size = 0
+        for i, ch in enumerate(text):
+            width = len(ch.encode("utf-8"))
+            if size + width > budget:
+                pieces.append(text[start:i])
+                start, size = i, 0
+            size += width
+        pieces.append(text[start:])
+    else:
+        offsets = tokenizer.encode(text, add_special_tokens=False).offsets
+        bounds = [offsets[i][0] for i in range(max_tokens, len(offsets), max_tokens)]
+        pieces = [text[a:b] for a, b in zip([0] + bounds, bounds + [len(text)])]
+    return list(zip(pieces, count_tokens(pieces)))
+
+
+# A sentence ends at a Latin-style terminator followed by whitespace, at a
+# CJK / Devanagari terminator (no space needed), or at a line break. A boundary
+# spanning two or more newlines also ends a paragraph.
+SENTENCE_BOUNDARY = regex.compile(
+    r"[.!?…]+[\"'”’»)\]]*\s+"
+    r"|[。！？；।]+[」』”’）]*\s*"
+    r"|\n\s*"
+)
+
+
+class _Sentence(NamedTuple):
+    start: int  # document offsets
+    end: int
+    tokens: int
+    paragraph_end: bool
+
+
+class Chunk:
+    """
+    A chunk as a [start, end) span of document offsets, resolved against a
+    buffer shared with neighbouring chunks that holds the document from
+    offset `offset`. The text is only copied out when `text` is read.
+    """
+
+    __slots__ = ("buffer", "offset", "start", "end", "tokens")
+
+    def __init__(self, buffer: str, offset: int, start: int, end: int, tokens: int):
+        self.buffer = buffer
+        self.offset = offset
+        self.start = start
+        self.end = end
+        self.tokens = tokens
+
+    @property
+    def text(self) -> str:
+        return self.buffer[self.start - self.offset : self.end - self.offset]
+
+    def text_from(self, start: int) -> str:
+        """The chunk's text from document offset `start` (>= self.start) on."""
+        return self.buffer[start - self.offset : self.end - self.offset]
+
+    def __repr__(self) -> str:
+        return f"Chunk({self.start}, {self.end})"
+
+
+class TextChunker:
+    """
+    Incremental, token-measured chunker: feed() text as it arrives to get
+    back the chunks that are complete, then flush() for the tail.
+
+    Text is cut into sentences, which are packed into chunks of at most
+    `max_tokens` tokens. Once a chunk is half full it ends at the first
+    anchor: a paragraph end, or a sentence whose hash is 0 modulo
+    `anchor_period`. Anchors depend only on the text, so after an edit the
+    chunking falls back in step with the old one at the next anchor. A chunk
+    that fills up first ends at its last paragraph break in its second half.
+    Consecutive chunks share up to `overlap_tokens` tokens of whole
+    sentences. Every sentence is tokenized once and the text waiting for a
+    sentence end is bounded, so the cost is linear in the input.
+
+    Sentences and chunks are document offsets into a window holding just the
+    text from the current chunk on, so chunks emitted together share one
+    buffer instead of each owning a copy.
+    """
+
+    def __init__(
+        self,
+        max_tokens: int = CHUNK_MAX_TOKENS,
+        overlap_tokens: int = CHUNK_OVERLAP_TOKENS,
+        anchor_period: int = CHUNK_ANCHOR_PERIOD,
+    ):
+        self.max_tokens = max_tokens
+        self.overlap_tokens = min(overlap_tokens, max_tokens // 2)
+        self.anchor_period = max(1, anchor_period)
+        # Unterminated text longer than this is packed without waiting for a sentence end
+        self.max_pending_chars = max_tokens * 16
+        self._window = ""
+        self._window_start = 0
+        self._pending_start = 0  # start of the text not yet cut into sentences
+        self._current: List[_Sentence] = []
+        self._tokens = 0
+        self._fresh = 0  # sentences in _current not yet emitted in a previous chunk
+
+    @property
+    def _fed(self) -> int:
+        return self._window_start + len(self._window)
+
+    def _slice(self, start: int, end: int) -> str:
+        return self._window[start - self._window_start : end - self._window_start]
+
+    def feed(self, text: str) -> List[Chunk]:
+        self._window += text
+        base = self._window_start
+        sentences = []
+        for match in SENTENCE_BOUNDARY.finditer(self._window, self._pending_start - base):
+            # A boundary touching the end may still grow (". " + "\n" = paragraph end)
+            if match.end() == len(self._window):
+                break
+            end = base + match.end()
+            sentences.append((self._pending_start, end, match.group().count("\n") >= 2))
+            self._pending_start = end
+        if self._fed - self._pending_start > self.max_pending_chars:
+            sentences.append((self._pending_start, self._fed, False))
+            self._pending_start = self._fed
+        chunks = self._pack(sentences)
+
+        # Everything before the current chunk has been emitted and can go
+        keep = min([self._pending_start] + [s.start for s in self._current[:1]])
+        self._window = self._window[keep - base :]
+        self._window_start = keep
+        return chunks
+
+    def flush(self) -> List[Chunk]:
+        sentences = []
+        if self._slice(self._pending_start, self._fed).strip():
+            sentences.append((self._pending_start, self._fed, True))
+        chunks = self._pack(sentences)
+        if self._fresh:
+            chunks.append(self._chunk(self._current))
+        self.__init__(self.max_tokens, self.overlap_tokens, self.anchor_period)
+        return chunks
+
+    def _chunk(self, units: List[_Sentence]) -> Chunk:
+        return Chunk(
+            self._window, self._window_start, units[0].start, units[-1].end, sum(u.tokens for u in units)
+        )
+
+    def _is_anchor(self, text: str, paragraph_end: bool) -> bool:
+        # crc32 rather than hash(), which is salted per process
+        return paragraph_end or zlib.crc32(text.strip().encode("utf-8")) % self.anchor_period == 0
+
+    def _pack(self, sentences: List[Tuple[int, int, bool]]) -> List[Chunk]:
+        chunks = []
+        texts = [self._slice(start, end) for start, end, _ in sentences]
+        for (start, end, paragraph_end), text, tokens in zip(sentences, texts, count_tokens(texts)):
+            anchor = self._is_anchor(text, paragraph_end)
+            if tokens <= self.max_tokens:
+                units = [_Sentence(start, end, tokens, paragraph_end)]
+            else:
+                units = []
+                for piece, n in split_by_tokens(self._slice(start, end), self.max_tokens):
+                    units.append(_Sentence(start, start + len(piece), n, False))
+                    start += len(piece)
+                units[-1] = units[-1]._replace(paragraph_end=paragraph_end)
+
+            for unit in units:
+                while self._current and self._tokens + unit.tokens > self.max_tokens:
+                    if not self._fresh:
+                        # Only overlap is left and it doesn't fit next to this sentence
+                        self._current = []
+                        self._tokens = 0
+                        break
+                    chunks.append(self._cut())
+                self._current.append(unit)
+                self._tokens += unit.tokens
+                self._fresh += 1
+            if anchor and self._tokens >= self.max_tokens // 2:
+                chunks.append(self._cut(len(self._current)))
+        return chunks
+
+    def _cut(self, cut: Optional[int] = None) -> Chunk:
+        units = self._current
+        if cut is None:
+            first_fresh = len(units) - self._fresh
+            cut = len(units)
+            running = 0
+            for i, unit in enumerate(units[:-1]):
+                running += unit.tokens
+                if unit.paragraph_end and i >= first_fresh and running >= self.max_tokens // 2:
+                    cut = i + 1
+        chunk, leftover = units[:cut], units[cut:]
+
+        # Carry the chunk's last sentences over as the next chunk's overlap
+        tail = []
+        tail_tokens = 0
+        for unit in reversed(chunk):
+            if tail_tokens + unit.tokens > self.overlap_tokens:
+                break
+            tail.append(unit)
+            tail_tokens += unit.tokens
+        tail.reverse()
+
+        self._current = tail + leftover
+        self._tokens = tail_tokens + sum(unit.tokens for unit in leftover)
+        self._fresh = len(leftover)
+        return self._chunk(chunk)
+
+
+def chunk_text(
+    text: Union[str, Iterable[str]],
+    max_tokens: int = CHUNK_MAX_TOKENS,
+    overlap_tokens: int = CHUNK_OVERLAP_TOKENS,
+) -> Iterator[Chunk]:
+    """
+    Yield sentence-aligned chunks of at most `max_tokens` tokens from `text`,
+    which may be a single string or a stream of pieces (pages, paragraphs, ...).
+    """
+    chunker = TextChunker(max_tokens, overlap_tokens)
+    for piece in [text] if isinstance(text, str) else text:
+        yield from chunker.feed(piece)
+    yield from chunker.flush()
+
+
+async def chunk_text_stream(
+    pieces: AsyncIterator[str],
+    max_tokens: int = CHUNK_MAX_TOKENS,
+    overlap_tokens: int = CHUNK_OVERLAP_TOKENS,
+) -> AsyncIterator[Chunk]:
+    """
+    chunk_text over a stream. Tokenizing and cutting are CPU work, so each
+    piece is fed to the chunker on the thread pool.
+    """
+    chunker = TextChunker(max_tokens, overlap_tokens)
+    async for piece in pieces:
+        for chunk in await run_in_threadpool(lambda: list(chunker.feed(piece))):
+            yield chunk
+    for chunk in await run_in_threadpool(lambda: list(chunker.flush())):
+        yield chunk
@@ -0,0 +1,95 @@
+"""
+Deterministic language identification from character n-gram profiles.
+
+Uses the n-gram frequency profiles that ship with langdetect, but scores
+text with plain naive Bayes over a dense log-probability matrix held in
+memory, instead of langdetect's randomized sampling: the same text always
+gets the same answer, and a text costs one gather and one dot product.
+"""
+import json
+import os
+from collections import Counter
+from typing import Dict, List
+
+import langdetect
+import numpy as np
+from langdetect.utils.ngram import NGram
+
+PROFILES_DIR = os.path.join(os.path.dirname(langdetect.__file__), "profiles")
+MAX_NGRAM = 3
+# langdetect's smoothing: every n-gram probability gets alpha / base frequency added
+SMOOTHING = 0.5 / 10000
+UNKNOWN = "unknown"
+
+
+class _NormalizeTable(dict):
+    """str.translate table applying langdetect's per-character normalization, filled on demand."""
+
+    def __missing__(self, codepoint: int) -> str:
+        value = self[codepoint] = NGram.normalize(chr(codepoint))
+        return value
+
+
+class NgramLanguageDetector:
+    """
+    Naive Bayes over the 1- to 3-gram profiles in `profiles_dir`, smoothed
+    the way langdetect smooths them so one unseen n-gram can't rule a
+    language out. Only the first `max_chars` of each text are read.
+    """
+
+    def __init__(self, profiles_dir: str = PROFILES_DIR, max_chars: int = 2000):
+        self.max_chars = max_chars
+        self.languages: List[str] = []
+        self._vocab: Dict[str, int] = {}
+        self._table = _NormalizeTable()
+
+        rows, cols, counts, totals = [], [], [], []
+        for col, name in enumerate(sorted(os.listdir(profiles_dir))):
+            with open(os.path.join(profiles_dir, name), encoding="utf-8") as f:
+                profile = json.load(f)
+            self.languages.append(profile["name"])
+            totals.append(profile["n_words"])
+            for gram, count in profile["freq"].items():
+                if 1 <= len(gram) <= MAX_NGRAM:
+                    rows.append(self._vocab.setdefault(gram, len(self._vocab)))
+                    cols.append(col)
+                    counts.append(count)
+
+        # totals[n - 1, lang] is the number of n-grams the profile was built from
+        totals = np.maximum(np.asarray(totals, dtype=np.float64).T, 1.0)
+        lengths = np.zeros(len(self._vocab), dtype=np.intp)
+        for gram, row in self._vocab.items():
+            lengths[row] = len(gram) - 1
+        rows = np.asarray(rows, dtype=np.intp)
+        cols = np.asarray(cols, dtype=np.intp)
+        probs = np.zeros((len(self._vocab), len(self.languages)))
+        probs[rows, cols] = np.asarray(counts, dtype=np.float64) / totals[lengths[rows], cols]
+        self._logp = np.log(probs + SMOOTHING).astype(np.float32)
+
+    def _ngrams(self, text: str) -> Counter:
+        grams = Counter()
+        for word in text[: self.max_chars].translate(self._table).split():
+            # langdetect skips all-caps words (acronyms, headings) the same way
+            if len(word) > 1 and word.isupper():
+                continue
+            padded = f" {word} "
+            grams.update(word)
+            for n in range(2, MAX_NGRAM + 1):
+                grams.update(padded[i : i + n] for i in range(len(padded) - n + 1))
+        return grams
+
+    def detect_one(self, text: str) -> str:
+        rows, weights = [], []
+        for gram, count in self._ngrams(text).items():
+            row = self._vocab.get(gram)
+            if row is not None:
+                rows.append(row)
+                weights.append(count)
+        if not rows:
+            return UNKNOWN
+        scores = np.asarray(weights, dtype=np.float32) @ self._logp[rows]
+        return self.languages[int(np.argmax(scores))]
+
+    def detect(self, texts: List[str]) -> List[str]:
+        """Language code per text (langdetect's codes), or "unknown" if nothing matched."""
+        return [self.detect_one(text) for text in texts]
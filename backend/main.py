@@ -1,31 +1,88 @@
 # main.py
 
 import os
-import io
-from typing import List, Dict
-
-from fastapi import FastAPI, UploadFile, File, HTTPException, Response
+import asyncio
+import codecs
+import hashlib
+import multiprocessing
+import sqlite3
+import tempfile
+import threading
+import time
+import uuid
+from bisect import bisect_right
+from collections import Counter, deque
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from typing import AsyncIterator, BinaryIO, Callable, Iterator, List, Dict, Optional, Tuple
+
+from fastapi import FastAPI, UploadFile, File, HTTPException, Query, Response
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
-from langdetect import detect
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, Field
+import httpx
 import openai
+from openai import AsyncOpenAI, DefaultAsyncHttpxClient
 from dotenv import load_dotenv
 
-import PyPDF2
+import numpy as np
 import docx
 import chromadb
 from chromadb.config import Settings
 
+from starlette.concurrency import iterate_in_threadpool, run_in_threadpool
 from starlette.middleware.base import BaseHTTPMiddleware
 from starlette.requests import Request
 
+from caches import EmbeddingCache, SQLiteLRUCache, text_key
+from chunking import Chunk, chunk_text_stream, count_tokens, get_tokenizer
+from language import UNKNOWN, NgramLanguageDetector
+from pdf_extract import iter_pdf_pages
+from rate_limit import RequestScheduler
+from serialization import NDJSON, dumps_json, negotiate, render
+from snapshots import ARROW_STREAM, arrow_stream, import_snapshot, iter_pages, ndjson_lines, pa
+from vector_store import NumpyVectorStore, VectorStore
+
 
 # ─── 1. Load environment (including OPENAI_API_KEY) ────────────────────────
 load_dotenv()
-openai.api_key = os.getenv("OPENAI_API_KEY")
-if not openai.api_key:
+OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
+if not OPENAI_API_KEY:
     raise RuntimeError("OPENAI_API_KEY environment variable is missing")
 
+# One async client for every OpenAI call, so all requests share a single
+# keep-alive connection pool instead of opening connections per call
+OPENAI_MAX_CONNECTIONS = int(os.getenv("OPENAI_MAX_CONNECTIONS", "32"))
+openai_client = AsyncOpenAI(
+    api_key=OPENAI_API_KEY,
+    http_client=DefaultAsyncHttpxClient(
+        limits=httpx.Limits(
+            max_connections=OPENAI_MAX_CONNECTIONS,
+            max_keepalive_connections=OPENAI_MAX_CONNECTIONS,
+        ),
+    ),
+    max_retries=0,  # retries are handled by openai_scheduler
+)
+EMBEDDING_MODEL = "text-embedding-3-small"
+# Width of the embeddings requested (the model's full width is 1536; it can
+# return shortened ones). Part of the vector store, so changing it takes a
+# new store and a re-ingest.
+EMBEDDING_DIMENSIONS = int(os.getenv("EMBEDDING_DIMENSIONS", "1536"))
+# Cached vectors are only reused at the width they were requested at; full
+# width keeps the namespace entries were cached under before this setting
+EMBEDDING_CACHE_NAMESPACE = (
+    EMBEDDING_MODEL if EMBEDDING_DIMENSIONS == 1536 else f"{EMBEDDING_MODEL}@{EMBEDDING_DIMENSIONS}"
+)
+CHAT_MODEL = "gpt-3.5-turbo"
+
+# Every OpenAI call is admitted against per-model request/token budgets (set
+# these to the account's limits) and retried on 429 / 5xx with backoff
+openai_scheduler = RequestScheduler(
+    requests_per_minute=int(os.getenv("OPENAI_REQUESTS_PER_MINUTE", "3000")),
+    tokens_per_minute=int(os.getenv("OPENAI_TOKENS_PER_MINUTE", "1000000")),
+    max_retries=int(os.getenv("OPENAI_MAX_RETRIES", "6")),
+)
+
 
 # ─── 2. Initialize FastAPI ─────────────────────────────────────────────────
 app = FastAPI(
@@ -66,6 +123,50 @@ class LimitUploadSizeMiddleware(BaseHTTPMiddleware):
 MAX_UPLOAD_SIZE = 50 * 1024 * 1024
 app.add_middleware(LimitUploadSizeMiddleware, max_upload_size=MAX_UPLOAD_SIZE)
 
+# Uploads are copied to a disk spool in pieces of this size, so a request never
+# holds more than one piece of the body in memory at a time.
+UPLOAD_READ_CHUNK_SIZE = 1024 * 1024
+UPLOAD_SPOOL_DIR = os.getenv("UPLOAD_SPOOL_DIR") or None
+SUPPORTED_EXTENSIONS = ("pdf", "docx", "doc", "txt", "md", "text")
+
+# PDF pages are extracted on a process pool; 1 disables the pool and uses a thread
+PDF_EXTRACT_WORKERS = int(os.getenv("PDF_EXTRACT_WORKERS", str(os.cpu_count() or 1)))
+
+# Chunks are embedded and written to Chroma in batches of this many, so memory
+# during ingestion scales with the batch rather than with the document
+INGEST_BATCH_SIZE = int(os.getenv("INGEST_BATCH_SIZE", "256"))
+# Store writes run on the thread pool, but Chroma's client holds the GIL for a
+# whole call; writing this many rows per call keeps the event loop responsive
+STORE_WRITE_BATCH_SIZE = int(os.getenv("STORE_WRITE_BATCH_SIZE", "32"))
+# Translate non-English documents before embedding them. When off (globally, or
+# per upload with ?translate=false) the original text is embedded, since the
+# embedding model is multilingual, and only the chunks a query retrieves are
+# translated, at answer time
+TRANSLATE_ON_INGEST = os.getenv("TRANSLATE_ON_INGEST", "true").lower() in ("1", "true", "yes")
+# Non-English text is translated in sentence-aligned segments of at most this
+# many tokens, TRANSLATION_MAX_CONCURRENCY segments at a time process-wide.
+# Each request may produce TRANSLATION_OUTPUT_RATIO x its input tokens (+ slack),
+# capped at the chat model's output limit.
+TRANSLATION_SEGMENT_TOKENS = int(os.getenv("TRANSLATION_SEGMENT_TOKENS", "1000"))
+TRANSLATION_MAX_CONCURRENCY = int(os.getenv("TRANSLATION_MAX_CONCURRENCY", "4"))
+TRANSLATION_OUTPUT_RATIO = float(os.getenv("TRANSLATION_OUTPUT_RATIO", "1.5"))
+TRANSLATION_MAX_OUTPUT_TOKENS = int(os.getenv("TRANSLATION_MAX_OUTPUT_TOKENS", "4096"))
+# The language of each of those segments is detected separately, in batches of
+# this many, so only the segments that aren't English get translated
+LANGUAGE_DETECT_BATCH_SIZE = int(os.getenv("LANGUAGE_DETECT_BATCH_SIZE", "32"))
+
+# Stored chunks are read back (for /upload?detail=...) this many at a time
+CHUNK_READ_PAGE_SIZE = int(os.getenv("CHUNK_READ_PAGE_SIZE", "512"))
+# Rows per page read from the store by GET /export; memory use scales with this
+EXPORT_PAGE_SIZE = int(os.getenv("EXPORT_PAGE_SIZE", "1000"))
+
+# Ingestions (sync or ?async=true) that may run at once; async jobs beyond that
+# wait in a queue of at most INGEST_MAX_QUEUED_JOBS before /upload returns 429
+INGEST_MAX_CONCURRENT_JOBS = int(os.getenv("INGEST_MAX_CONCURRENT_JOBS", "2"))
+INGEST_MAX_QUEUED_JOBS = int(os.getenv("INGEST_MAX_QUEUED_JOBS", "32"))
+# Finished jobs stay visible on GET /jobs/{id} for this long
+JOB_TTL_SECONDS = int(os.getenv("JOB_TTL_SECONDS", "3600"))
+
 
 # ─── 5. Allow CORS from our frontend ───────────────────────────────────────
 app.add_middleware(
@@ -79,33 +180,272 @@ app.add_middleware(
 )
 
 
-# ─── 6. Initialize ChromaDB client & collection ────────────────────────────
-chroma_client = chromadb.Client(
-    Settings(
-        persist_directory="chroma_db",
-        anonymized_telemetry=False,
+# ─── 6. Initialize the vector store & local indexes ────────────────────────
+# VECTOR_STORE picks the backend: "chroma" (HNSW, approximate) or "numpy",
+# exact search over a memory-mapped matrix under NUMPY_STORE_PATH, which is
+# faster and has perfect recall up to roughly 100k chunks. Either way the
+# store is on disk, so a restart reopens it instead of needing a re-ingest.
+VECTOR_STORE = os.getenv("VECTOR_STORE", "chroma")
+if VECTOR_STORE not in ("chroma", "numpy"):
+    raise RuntimeError(f"VECTOR_STORE must be 'chroma' or 'numpy', not {VECTOR_STORE!r}")
+# Chroma keeps SQLite plus the HNSW segment files here
+CHROMA_PATH = os.getenv("CHROMA_PATH", "chroma_db")
+NUMPY_STORE_PATH = os.getenv("NUMPY_STORE_PATH", "numpy_store")
+# Numpy store only: "int8" or "binary" scans codes 4x / 32x smaller than the
+# float32 matrix, then re-ranks the best VECTOR_RERANK_CANDIDATES exactly
+# against the matrix on disk. Unset keeps the search exact.
+VECTOR_QUANTIZATION = os.getenv("VECTOR_QUANTIZATION") or None
+VECTOR_RERANK_CANDIDATES = int(os.getenv("VECTOR_RERANK_CANDIDATES", "100"))
+
+# Chroma's HNSW index settings (its defaults). Chroma fixes them when the collection
+# is created, so changing them takes a new store, e.g. via /export + SNAPSHOT_PATH.
+# HNSW_SEARCH_EF is the default search breadth; /query can widen it per request
+# up to QUERY_MAX_EF_SEARCH.
+HNSW_SPACE = os.getenv("HNSW_SPACE", "l2")
+HNSW_M = int(os.getenv("HNSW_M", "16"))
+HNSW_CONSTRUCTION_EF = int(os.getenv("HNSW_CONSTRUCTION_EF", "100"))
+HNSW_SEARCH_EF = int(os.getenv("HNSW_SEARCH_EF", "100"))
+QUERY_MAX_EF_SEARCH = int(os.getenv("QUERY_MAX_EF_SEARCH", "1000"))
+HNSW_METADATA = {
+    "hnsw:space": HNSW_SPACE,
+    "hnsw:M": HNSW_M,
+    "hnsw:construction_ef": HNSW_CONSTRUCTION_EF,
+    "hnsw:search_ef": HNSW_SEARCH_EF,
+}
+
+collection: VectorStore
+if VECTOR_STORE == "numpy":
+    chroma_client = None
+    collection = NumpyVectorStore(
+        NUMPY_STORE_PATH,
+        metadata={"embedding_dimensions": EMBEDDING_DIMENSIONS},
+        quantization=VECTOR_QUANTIZATION,
+        rerank_candidates=VECTOR_RERANK_CANDIDATES,
+    )
+else:
+    chroma_client = chromadb.PersistentClient(
+        path=CHROMA_PATH,
+        settings=Settings(anonymized_telemetry=False),
+    )
+    collection = chroma_client.get_or_create_collection(
+        name="documents",
+        metadata={**HNSW_METADATA, "embedding_dimensions": EMBEDDING_DIMENSIONS},
+    )
+
+
+def stored_embedding_dimensions(collection: VectorStore) -> Optional[int]:
+    """
+    Width of the embeddings the store was built with: recorded in its
+    metadata when it was created, or, for stores older than that, read off
+    a stored row. None for a store without either.
+    """
+    recorded = (collection.metadata or {}).get("embedding_dimensions")
+    if recorded is not None:
+        return int(recorded)
+    sample = collection.get(limit=1, include=["embeddings"])
+    return len(sample["embeddings"][0]) if len(sample["ids"]) else None
+
+
+# Embeddings of another width can't be searched against the stored ones
+_stored_dimensions = stored_embedding_dimensions(collection)
+if _stored_dimensions not in (None, EMBEDDING_DIMENSIONS):
+    raise RuntimeError(
+        f"The vector store holds {_stored_dimensions}-dimensional embeddings but EMBEDDING_DIMENSIONS "
+        f"is {EMBEDDING_DIMENSIONS}: set it back, or point the app at a new store and re-ingest"
     )
+
+
+def _hnsw_settings(collection: VectorStore) -> Dict:
+    """The collection's HNSW settings in metadata form; chromadb 1.x reports them as configuration."""
+    configuration = getattr(collection, "configuration", None)
+    hnsw = configuration.get("hnsw") if isinstance(configuration, dict) else None
+    if hnsw:
+        return {
+            "hnsw:space": hnsw["space"],
+            "hnsw:M": hnsw["max_neighbors"],
+            "hnsw:construction_ef": hnsw["ef_construction"],
+            "hnsw:search_ef": hnsw["ef_search"],
+        }
+    return collection.metadata or {}
+
+
+if chroma_client is not None:
+    _hnsw_current = _hnsw_settings(collection)
+    _hnsw_mismatch = {
+        key: _hnsw_current[key]
+        for key, value in HNSW_METADATA.items()
+        if _hnsw_current.get(key, value) != value
+    }
+    if _hnsw_mismatch:
+        print(f"⚠️  existing collection keeps its HNSW settings {_hnsw_mismatch}, not the configured ones", flush=True)
+
+# A snapshot (GET /export?format=arrow output, or the same columns as Parquet)
+# to load into an empty store at startup, so a redeploy needs no re-embedding.
+# Chroma builds its HNSW graph row by row, which takes hours for a million
+# chunks; VECTOR_STORE=numpy only appends to its files and loads in minutes.
+SNAPSHOT_PATH = os.getenv("SNAPSHOT_PATH")
+SNAPSHOT_IMPORT_BATCH_SIZE = int(os.getenv("SNAPSHOT_IMPORT_BATCH_SIZE", "5000"))
+
+
+@app.on_event("startup")
+async def load_snapshot():
+    if not SNAPSHOT_PATH:
+        return
+    if pa is None or not os.path.exists(SNAPSHOT_PATH):
+        print(f"⚠️  snapshot {SNAPSHOT_PATH!r} not loaded: missing file or pyarrow", flush=True)
+        return
+    if collection.count():
+        print(f"⚠️  snapshot {SNAPSHOT_PATH!r} not loaded: the store already has chunks", flush=True)
+        return
+    started = time.monotonic()
+    batch_size = SNAPSHOT_IMPORT_BATCH_SIZE
+    if chroma_client is not None:
+        batch_size = min(batch_size, chroma_client.get_max_batch_size())
+    try:
+        rows = await run_in_threadpool(import_snapshot, collection, SNAPSHOT_PATH, batch_size, EMBEDDING_DIMENSIONS)
+    except ValueError as e:
+        print(f"⚠️  snapshot {SNAPSHOT_PATH!r} not loaded: {e}", flush=True)
+        return
+    print(f"📦 loaded {rows} chunks from snapshot {SNAPSHOT_PATH!r} in {time.monotonic() - started:.1f}s", flush=True)
+
+
+def _warm_vector_index() -> int:
+    sample = collection.get(limit=1, include=["embeddings"])
+    if not len(sample["ids"]):
+        return 0
+    collection.query(query_embeddings=sample["embeddings"], n_results=1, include=["distances"])
+    return collection.count()
+
+
+@app.on_event("startup")
+async def warm_vector_index():
+    """
+    Chroma reads a persisted HNSW segment from disk on first use, and the
+    numpy store pages its matrix in; run one query at startup so that cost
+    isn't paid by the first /query.
+    """
+    started = time.monotonic()
+    rows = await run_in_threadpool(_warm_vector_index)
+    if rows:
+        path = NUMPY_STORE_PATH if chroma_client is None else CHROMA_PATH
+        print(f"📦 opened {rows} stored chunks from {path!r} in {time.monotonic() - started:.1f}s", flush=True)
+
+# Local state (fingerprint index, caches) lives under DATA_DIR
+DATA_DIR = os.getenv("DATA_DIR", "data")
+
+
+class FingerprintIndex:
+    """
+    Persistent SHA-256 → ingested document index, used to short-circuit
+    re-uploads of byte-identical files.
+    """
+
+    def __init__(self, path: str):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        # Called from the thread pool; one connection, one transaction at a time
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        with self._db:
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS documents ("
+                " sha256 TEXT PRIMARY KEY,"
+                " filename TEXT NOT NULL,"
+                " total_chunks INTEGER NOT NULL,"
+                " original_language TEXT NOT NULL,"
+                " created_at REAL NOT NULL)"
+            )
+
+    def get(self, digest: str) -> Optional[Dict]:
+        with self._lock:
+            row = self._db.execute(
+                "SELECT filename, total_chunks, original_language FROM documents WHERE sha256 = ?",
+                (digest,),
+            ).fetchone()
+        if row is None:
+            return None
+        return {"filename": row[0], "total_chunks": row[1], "original_language": row[2]}
+
+    def add(self, digest: str, filename: str, total_chunks: int, original_language: str) -> None:
+        """Record `digest` as the current version of `filename`, replacing earlier versions."""
+        with self._lock, self._db:
+            self._db.execute("DELETE FROM documents WHERE filename = ?", (filename,))
+            self._db.execute(
+                "INSERT OR REPLACE INTO documents VALUES (?, ?, ?, ?, ?)",
+                (digest, filename, total_chunks, original_language, time.time()),
+            )
+
+    def discard(self, digest: str) -> None:
+        with self._lock, self._db:
+            self._db.execute("DELETE FROM documents WHERE sha256 = ?", (digest,))
+
+
+fingerprints = FingerprintIndex(os.path.join(DATA_DIR, "fingerprints.sqlite3"))
+
+# Embeddings are cached per (model, normalized text) so repeated chunks are only paid for once
+EMBEDDING_CACHE_MAX_ENTRIES = int(os.getenv("EMBEDDING_CACHE_MAX_ENTRIES", "100000"))
+embedding_cache = EmbeddingCache(
+    os.path.join(DATA_DIR, "embedding_cache.sqlite3"), EMBEDDING_CACHE_MAX_ENTRIES
 )
-collection = chroma_client.get_or_create_collection(name="documents")
 
+# Translations are deterministic (temperature 0), so they are cached per
+# (model, source language, normalized segment)
+TRANSLATION_CACHE_MAX_ENTRIES = int(os.getenv("TRANSLATION_CACHE_MAX_ENTRIES", "50000"))
+translation_cache = SQLiteLRUCache(
+    os.path.join(DATA_DIR, "translation_cache.sqlite3"), TRANSLATION_CACHE_MAX_ENTRIES
+)
+
+# Embedding requests in flight across the whole process
+EMBEDDING_MAX_CONCURRENCY = int(os.getenv("EMBEDDING_MAX_CONCURRENCY", "8"))
+embedding_slots = asyncio.Semaphore(EMBEDDING_MAX_CONCURRENCY)
+# Embedding requests are packed up to these limits (the API allows 2048 inputs
+# and 300k tokens per request); a request rejected as too large is split in two
+EMBEDDING_MAX_TOKENS_PER_REQUEST = int(os.getenv("EMBEDDING_MAX_TOKENS_PER_REQUEST", "100000"))
+EMBEDDING_MAX_INPUTS_PER_REQUEST = int(os.getenv("EMBEDDING_MAX_INPUTS_PER_REQUEST", "2048"))
 
 # ─── 7. Pydantic Models ─────────────────────────────────────────────────────
 class ChunkWithEmbedding(BaseModel):
     chunk_index: int
     text: str
     original_language: str
-    embedding: List[float]
+    embedding: str  # little-endian float32 or float16 values: base64 in JSON, bin in MessagePack
 
 
-class UploadResponse(BaseModel):
+class IngestSummary(BaseModel):
     filename: str
     total_chunks: int
-    chunks: List[ChunkWithEmbedding]
+    original_language: str  # the language most of the text is in
+    translated: bool = False  # some stored chunks are an English translation
+    deduplicated: bool = False  # True if an identical file was already indexed
+    chunks_reused: int = 0  # unchanged chunks of an earlier version, not re-embedded
+    chunks_removed: int = 0  # chunks of an earlier version that are gone
+
+
+class UploadResponse(IngestSummary):
+    timings: Dict[str, float]  # seconds per stage, as in JobStatus
+    # Only with ?detail=chunks
+    embedding_dtype: Optional[str] = None
+    chunks: Optional[List[ChunkWithEmbedding]] = None
+
+
+class JobStatus(BaseModel):
+    job_id: str
+    filename: str
+    stage: str  # queued → reading → embedding → done | failed
+    read_progress: float  # share of the document extracted: bytes for text, paragraphs for .docx, pages for PDFs
+    chunks_embedded: int
+    total_chunks: Optional[int]  # set when the last chunk is cut, while earlier ones may still be embedding
+    timings: Dict[str, float]  # seconds per stage, plus cumulative embedding_calls / store_writes
+    error: Optional[str] = None
+    result: Optional[IngestSummary] = None
 
 
 class QueryRequest(BaseModel):
     question: str
     top_k: int = 3  # number of chunks to retrieve for context
+    # HNSW search breadth: higher finds the true nearest chunks more often, at
+    # some latency. Only widens the collection's HNSW_SEARCH_EF, never narrows it;
+    # ignored by the numpy store (see VECTOR_RERANK_CANDIDATES instead).
+    ef_search: Optional[int] = Field(None, ge=1, le=QUERY_MAX_EF_SEARCH)
 
 
 class QueryResponse(BaseModel):
@@ -114,80 +454,508 @@ class QueryResponse(BaseModel):
 
 
 # ─── 8. Utility Functions ───────────────────────────────────────────────────
-def extract_text_from_pdf(file_stream: io.BytesIO) -> str:
-    reader = PyPDF2.PdfReader(file_stream)
-    text = []
-    for page in reader.pages:
-        try:
-            text.append(page.extract_text() or "")
-        except Exception:
-            continue
-    return "\n".join(text)
+async def spool_upload(file: UploadFile) -> Tuple[BinaryIO, str]:
+    """
+    Copy the upload body into a temporary file on disk, one piece at a time,
+    hashing it on the way. Returns the handle (positioned at 0) and the
+    SHA-256 hex digest of the body. The caller owns the handle and must close
+    it, which also deletes the file.
+    """
+    spool = tempfile.NamedTemporaryFile(prefix="docuquest-", dir=UPLOAD_SPOOL_DIR)
+    sha256 = hashlib.sha256()
+    size = 0
+    try:
+        while True:
+            block = await file.read(UPLOAD_READ_CHUNK_SIZE)
+            if not block:
+                break
+            size += len(block)
+            # Content-Length is optional, so enforce the limit on what we actually read
+            if size > MAX_UPLOAD_SIZE:
+                raise HTTPException(status_code=413, detail="Upload payload too large")
+            sha256.update(block)
+            spool.write(block)
+        spool.flush()
+        spool.seek(0)
+    except BaseException:
+        spool.close()
+        raise
+    return spool, sha256.hexdigest()
+
+
+_pdf_pool: Optional[ProcessPoolExecutor] = None
+
+
+def get_pdf_pool() -> Optional[ProcessPoolExecutor]:
+    """
+    Lazily start the PDF extraction pool. Returns None when the pool is
+    disabled, which makes run_in_executor fall back to the default thread pool.
+    """
+    global _pdf_pool
+    if _pdf_pool is None and PDF_EXTRACT_WORKERS > 1:
+        # Spawn rather than fork: by now the process runs threads (the thread
+        # pool, Chroma, tokenizers), and a forked child can inherit their locks held
+        _pdf_pool = ProcessPoolExecutor(
+            max_workers=PDF_EXTRACT_WORKERS, mp_context=multiprocessing.get_context("spawn")
+        )
+    return _pdf_pool
 
 
-def extract_text_from_docx(file_stream: io.BytesIO) -> str:
+@app.on_event("shutdown")
+async def close_openai_client():
+    await openai_client.close()
+
+
+@app.on_event("shutdown")
+async def shutdown_pdf_pool():
+    if _pdf_pool is not None:
+        _pdf_pool.shutdown(wait=False, cancel_futures=True)
+
+
+# Extractors report how far they are as progress(done, total), in their own unit
+ReadProgress = Callable[[int, int], None]
+
+
+async def extract_text_from_pdf(path: str, progress: ReadProgress) -> AsyncIterator[str]:
+    async for page in iter_pdf_pages(path, get_pdf_pool(), PDF_EXTRACT_WORKERS, progress):
+        yield page + "\n"
+
+
+def extract_text_from_docx(file_stream: BinaryIO, progress: ReadProgress) -> Iterator[str]:
     doc = docx.Document(file_stream)
-    paragraphs = [p.text for p in doc.paragraphs if p.text]
-    return "\n".join(paragraphs)
+    paragraphs = doc.paragraphs
+    for done, p in enumerate(paragraphs, start=1):
+        progress(done, len(paragraphs))
+        if p.text:
+            yield p.text + "\n"
+
+
+def extract_text_from_txt(file_stream: BinaryIO, progress: ReadProgress) -> Iterator[str]:
+    size = os.fstat(file_stream.fileno()).st_size
+    # Decode incrementally so a multibyte character split across two reads survives
+    decoder = codecs.getincrementaldecoder("utf-8")(errors="ignore")
+    for block in iter(lambda: file_stream.read(UPLOAD_READ_CHUNK_SIZE), b""):
+        progress(file_stream.tell(), size)
+        yield decoder.decode(block)
+    yield decoder.decode(b"", final=True)
+
 
+def iter_document_text(file_stream: BinaryIO, ext: str, progress: ReadProgress) -> AsyncIterator[str]:
+    """
+    Stream the text of a spooled upload as pages / paragraphs / blocks.
+    The synchronous extractors are stepped on the thread pool so they never
+    block the event loop.
+    """
+    if ext == "pdf":
+        return extract_text_from_pdf(file_stream.name, progress)
+    if ext in ("docx", "doc"):
+        return iterate_in_threadpool(extract_text_from_docx(file_stream, progress))
+    return iterate_in_threadpool(extract_text_from_txt(file_stream, progress))
 
-def extract_text_from_txt(file_stream: io.BytesIO) -> str:
-    return file_stream.read().decode("utf-8", errors="ignore")
 
+async def peek_text(pieces: AsyncIterator[str], min_chars: int) -> Tuple[str, AsyncIterator[str]]:
+    """
+    Read pieces until at least `min_chars` non-whitespace characters have been
+    seen. Returns that head as a string plus a stream that replays it in front
+    of the rest of `pieces`.
+    """
+    head = []
+    seen = 0
+    async for piece in pieces:
+        head.append(piece)
+        seen += len(piece.strip())
+        if seen >= min_chars:
+            break
+
+    async def replay():
+        for piece in head:
+            yield piece
+        async for piece in pieces:
+            yield piece
 
-def detect_language_of_text(text: str) -> str:
+    return "".join(head), replay()
+
+
+async def map_ordered(items: AsyncIterator, func, limit: int) -> AsyncIterator:
+    """
+    Yield `await func(item)` for each item, in input order, running up to
+    `limit` calls ahead of the consumer.
+    """
+    pending = deque()
     try:
-        return detect(text[:2000])
-    except Exception:
-        return "unknown"
+        async for item in items:
+            pending.append(asyncio.ensure_future(func(item)))
+            if len(pending) >= limit:
+                yield await pending.popleft()
+        while pending:
+            yield await pending.popleft()
+    finally:
+        for future in pending:
+            future.cancel()
+
 
+async def abatched(items: AsyncIterator, size: int) -> AsyncIterator[list]:
+    batch = []
+    async for item in items:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+@app.on_event("startup")
+async def load_tokenizer():
+    await run_in_threadpool(get_tokenizer)
+
+
+_language_detector: Optional[NgramLanguageDetector] = None
+
+
+def get_language_detector() -> NgramLanguageDetector:
+    global _language_detector
+    if _language_detector is None:
+        _language_detector = NgramLanguageDetector()
+    return _language_detector
+
+
+@app.on_event("startup")
+async def load_language_detector():
+    await run_in_threadpool(get_language_detector)
+
+
+def detect_languages(texts: List[str]) -> List[str]:
+    """Language code per text; deterministic, so re-ingesting a file gives the same answer."""
+    return get_language_detector().detect(texts)
+
+
+translation_slots = asyncio.Semaphore(TRANSLATION_MAX_CONCURRENCY)
+
+
+async def translate_to_english(text: str, source_language: str, tokens: Optional[int] = None) -> Optional[str]:
+    """
+    Translate one segment, from the translation cache when possible. The
+    output budget is derived from the segment's token count (`tokens`,
+    counted here if not given), so scripts without spaces get as much room
+    as any other. Returns None if the translation call failed.
+    """
+    namespace = f"{CHAT_MODEL}:{source_language}"
+    key = text_key(text)
+    cached = await run_in_threadpool(translation_cache.get_many, namespace, [key])
+    if cached:
+        return cached[key]
 
-async def translate_to_english(text: str) -> str:
     prompt = (
         "Translate the following text to fluent English. "
         "Maintain meaning exactly. "
         "Do not add any commentary—only output the translation.\n\n"
         f"{text}"
     )
+    if tokens is None:
+        tokens = count_tokens([text])[0]
+    max_tokens = min(TRANSLATION_MAX_OUTPUT_TOKENS, int(tokens * TRANSLATION_OUTPUT_RATIO) + 64)
     try:
-        resp = openai.chat.completions.create(
-            model="gpt-3.5-turbo",
-            messages=[
-                {"role": "system", "content": "You are a translation engine."},
-                {"role": "user", "content": prompt},
-            ],
-            temperature=0.0,
-            max_tokens=len(text.split()) * 2,
-        )
-        return resp.choices[0].message.content.strip()
-    except Exception:
-        return text
+        async with translation_slots:
+            resp = await openai_scheduler.call(
+                CHAT_MODEL,
+                tokens + 64 + max_tokens,  # segment + instructions, plus the output budget
+                lambda: openai_client.chat.completions.create(
+                    model=CHAT_MODEL,
+                    messages=[
+                        {"role": "system", "content": "You are a translation engine."},
+                        {"role": "user", "content": prompt},
+                    ],
+                    temperature=0.0,
+                    max_tokens=max_tokens,
+                ),
+            )
+        choice = resp.choices[0]
+        translated = choice.message.content.strip()
+    except Exception as e:
+        print(f"⚠️  translation of a {tokens}-token {source_language} segment failed: {e}", flush=True)
+        return None
+    # Truncated output isn't cached, so a later run with a larger budget can fix it
+    if choice.finish_reason == "length":
+        print(f"⚠️  translation hit max_tokens={max_tokens} for a {tokens}-token segment", flush=True)
+    else:
+        await run_in_threadpool(translation_cache.put_many, namespace, {key: translated})
+    return translated
+
+
+async def detect_segment_languages(pieces: AsyncIterator[str]) -> AsyncIterator[Tuple[Chunk, str]]:
+    """
+    Cut a text stream into sentence-aligned segments of at most
+    TRANSLATION_SEGMENT_TOKENS tokens and yield each with its language,
+    detected LANGUAGE_DETECT_BATCH_SIZE segments at a time.
+    """
+    segments = chunk_text_stream(pieces, TRANSLATION_SEGMENT_TOKENS, overlap_tokens=0)
+    async for batch in abatched(segments, LANGUAGE_DETECT_BATCH_SIZE):
+        languages = await run_in_threadpool(detect_languages, [segment.text for segment in batch])
+        for segment, language in zip(batch, languages):
+            yield segment, language
+
+
+def needs_translation(language: str) -> bool:
+    return language not in ("en", UNKNOWN)
 
 
-def chunk_text(text: str, chunk_size: int = 1000, overlap: int = 200) -> List[str]:
-    chunks = []
-    start = 0
-    length = len(text)
-    while start < length:
-        end = min(start + chunk_size, length)
-        chunks.append(text[start:end])
-        start += chunk_size - overlap
-    return chunks
+async def translate_stream(
+    segments: AsyncIterator[Tuple[Chunk, str]], translate: bool
+) -> AsyncIterator[Tuple[str, str, bool]]:
+    """
+    Yield (text, language, translated) per segment, in source order. With
+    `translate` on, non-English segments are replaced by their translation,
+    several at a time; everything else, including a segment whose
+    translation failed, passes through unchanged with translated=False.
+    """
+
+    async def translate_segment(item: Tuple[Chunk, str]) -> Tuple[str, str, bool]:
+        segment, language = item
+        source = segment.text
+        if not (translate and needs_translation(language)):
+            return source, language, False
+        translated = await translate_to_english(source, language, segment.tokens)
+        if translated is None:
+            # Stored untranslated, so /query translates it and a re-upload retries it
+            return source, language, False
+        # Keep the segment's own break (paragraph, line or space) after its translation
+        separator = source[len(source.rstrip()) :] or " "
+        return translated + separator, language, True
+
+    async for result in map_ordered(segments, translate_segment, TRANSLATION_MAX_CONCURRENCY):
+        yield result
+
+
+def pack_by_tokens(texts: List[str], max_tokens: int, max_inputs: int) -> List[Tuple[List[str], int]]:
+    """
+    Split `texts` into consecutive batches of at most `max_inputs` texts and
+    `max_tokens` tokens, returned with their token totals. A single text over
+    the token limit gets its own batch.
+    """
+    batches = []
+    batch = []
+    batch_tokens = 0
+    for text, tokens in zip(texts, count_tokens(texts)):
+        if batch and (len(batch) >= max_inputs or batch_tokens + tokens > max_tokens):
+            batches.append((batch, batch_tokens))
+            batch = []
+            batch_tokens = 0
+        batch.append(text)
+        batch_tokens += tokens
+    if batch:
+        batches.append((batch, batch_tokens))
+    return batches
+
+
+def _is_too_large(error: openai.APIStatusError) -> bool:
+    if error.status_code == 413:
+        return True
+    message = str(error).lower()
+    return error.status_code == 400 and any(
+        hint in message for hint in ("too large", "too many", "maximum", "max ")
+    )
 
 
-def get_embeddings_for_chunks(chunks: List[str]) -> List[List[float]]:
+async def get_embeddings_for_chunks(chunks: List[str]) -> List[List[float]]:
     """
     Generate embeddings by calling OpenAI’s v1-style SDK.
+    Vectors already in the embedding cache are reused; only the misses are
+    sent, and texts repeated within `chunks` are sent once. Misses are packed
+    into requests by token count and go out concurrently, at most
+    EMBEDDING_MAX_CONCURRENCY at a time process-wide.
+    """
+    model_name = EMBEDDING_MODEL
+    keys = await run_in_threadpool(lambda: [text_key(c) for c in chunks])
+    found = await run_in_threadpool(embedding_cache.get_many, EMBEDDING_CACHE_NAMESPACE, keys)
+
+    missing = {}
+    for key, chunk in zip(keys, chunks):
+        if key not in found:
+            missing.setdefault(key, chunk)
+
+    async def embed_batch(batch: List[str], tokens: int) -> List[List[float]]:
+        try:
+            async with embedding_slots:
+                resp = await openai_scheduler.call(
+                    model_name,
+                    tokens,
+                    lambda: openai_client.embeddings.create(
+                        model=model_name, input=batch, dimensions=EMBEDDING_DIMENSIONS
+                    ),
+                )
+        except openai.APIStatusError as e:
+            # Our token counts were off for this batch: halve it and retry both parts
+            if len(batch) > 1 and _is_too_large(e):
+                halves = (batch[: len(batch) // 2], batch[len(batch) // 2 :])
+                left, right = await asyncio.gather(*(embed_batch(h, sum(count_tokens(h))) for h in halves))
+                return left + right
+            raise
+        return [data_obj.embedding for data_obj in sorted(resp.data, key=lambda d: d.index)]
+
+    if missing:
+        miss_keys = list(missing)
+        miss_texts = list(missing.values())
+        # gather() returns results in submission order, whatever order they finish in
+        batches = await asyncio.gather(*(
+            embed_batch(batch, tokens)
+            for batch, tokens in pack_by_tokens(
+                miss_texts, EMBEDDING_MAX_TOKENS_PER_REQUEST, EMBEDDING_MAX_INPUTS_PER_REQUEST
+            )
+        ))
+        fresh = [embedding for batch in batches for embedding in batch]
+        new_embeddings = dict(zip(miss_keys, fresh))
+        await run_in_threadpool(embedding_cache.put_many, EMBEDDING_CACHE_NAMESPACE, new_embeddings)
+        found.update(new_embeddings)
+
+    return [found[key] for key in keys]
+
+
+def read_stored_rows(ids: List[str]) -> Dict[str, Tuple[Dict, str]]:
+    found = collection.get(ids=ids, include=["metadatas", "documents"])
+    return {i: (md, doc) for i, md, doc in zip(found["ids"], found["metadatas"], found["documents"])}
+
+
+def write_chunks(ids: List[str], metadatas: List[Dict], documents: List[str], embeddings: List[List[float]]) -> None:
+    """Upsert rows STORE_WRITE_BATCH_SIZE at a time; call it on the thread pool."""
+    for first in range(0, len(ids), STORE_WRITE_BATCH_SIZE):
+        last = first + STORE_WRITE_BATCH_SIZE
+        collection.upsert(
+            ids=ids[first:last],
+            metadatas=metadatas[first:last],
+            documents=documents[first:last],
+            embeddings=embeddings[first:last],
+        )
+
+
+def update_chunk_metadata(ids: List[str], metadatas: List[Dict]) -> None:
+    """Rewrite the metadata of stored rows, keeping their embeddings; on the thread pool."""
+    for first in range(0, len(ids), STORE_WRITE_BATCH_SIZE):
+        last = first + STORE_WRITE_BATCH_SIZE
+        collection.update(ids=ids[first:last], metadatas=metadatas[first:last])
+
+
+def delete_chunks(ids: List[str]) -> None:
+    for first in range(0, len(ids), STORE_WRITE_BATCH_SIZE):
+        collection.delete(ids=ids[first : first + STORE_WRITE_BATCH_SIZE])
+
+
+# Chunks are stored as spans: each chunk's document is only the text after the
+# previous chunk's end ([span_start, end) in its metadata), so the overlap is
+# kept once. The helpers below rebuild full chunk texts on read. Rows without
+# span_start predate this layout and hold the full chunk text.
+def embedding_bytes(embedding, dtype: str) -> bytes:
+    return np.asarray(embedding, dtype=np.dtype(dtype).newbyteorder("<")).tobytes()
+
+
+def iter_stored_chunks(source: str, total_chunks: int, embedding_dtype: str) -> Iterator[Dict]:
+    """
+    Read the stored chunks of `source` back out of Chroma in chunk order,
+    CHUNK_READ_PAGE_SIZE at a time, in the shape of ChunkWithEmbedding.
+    """
+    # Spans are contiguous, so the previous chunk plus this span covers this chunk
+    previous, previous_start = "", 0
+    for first in range(0, total_chunks, CHUNK_READ_PAGE_SIZE):
+        results = collection.get(
+            where={"$and": [
+                {"source": source},
+                {"chunk_index": {"$gte": first}},
+                {"chunk_index": {"$lt": first + CHUNK_READ_PAGE_SIZE}},
+            ]},
+            include=["metadatas", "documents", "embeddings"],
+        )
+        rows = sorted(
+            zip(results["metadatas"], results["documents"], results["embeddings"]),
+            key=lambda row: row[0]["chunk_index"],
+        )
+        for md, doc, emb in rows:
+            if "span_start" in md:
+                text = (previous + doc)[md["start"] - previous_start :]
+                previous, previous_start = text, md["start"]
+            else:
+                text = doc
+            yield {
+                "chunk_index": md["chunk_index"],
+                "text": text,
+                "original_language": md.get("original_language", "unknown"),
+                "embedding": embedding_bytes(emb, embedding_dtype),
+            }
+
+
+def rebuild_chunk_texts(metadatas: List[Dict], documents: List[str]) -> List[str]:
+    """
+    Full texts for stored chunks that don't come as a whole document (e.g.
+    query hits): each chunk's overlap is read from the spans of the chunks
+    just before it, one chunk further back per round until it is covered.
+    """
+    texts = list(documents)
+    # result position -> [source, chunk_index, start, covered_from, prefix]
+    need = {
+        i: [md["source"], md["chunk_index"], md["start"], md["span_start"], ""]
+        for i, md in enumerate(metadatas)
+        if "span_start" in md and md["start"] < md["span_start"]
+    }
+    distance = 1
+    while need:
+        wanted = {}
+        for source, index, _, _, _ in need.values():
+            wanted.setdefault(source, set()).add(index - distance)
+        clauses = [
+            {"$and": [{"source": source}, {"chunk_index": {"$in": sorted(indexes)}}]}
+            for source, indexes in wanted.items()
+        ]
+        results = collection.get(
+            where=clauses[0] if len(clauses) == 1 else {"$or": clauses},
+            include=["metadatas", "documents"],
+        )
+        # A predecessor's span ends where the spans after it start. Keying on
+        # that too tells it apart from a chunk of the version being replaced,
+        # while a new version is being indexed and both are stored.
+        spans = {
+            (md["source"], md["chunk_index"], md.get("end")): (md.get("span_start", md.get("start", 0)), doc)
+            for md, doc in zip(results["metadatas"], results["documents"])
+        }
+        for i, entry in list(need.items()):
+            source, index, start, covered_from, prefix = entry
+            span = spans.get((source, index - distance, covered_from))
+            if span is not None:
+                entry[3], entry[4] = span[0], span[1] + prefix
+            # Covered, or the predecessor is missing and this is as much as we can get
+            if span is None or entry[3] <= start:
+                texts[i] = (entry[4] + texts[i])[max(0, start - entry[3]) :]
+                del need[i]
+        distance += 1
+    return texts
+
+
+def search_chunks(embedding: List[float], top_k: int, ef_search: Optional[int]) -> Tuple[List[Dict], List[str]]:
     """
-    model_name = "text-embedding-3-small"
-    batch_size = 8
-    all_embeddings = []
-    for i in range(0, len(chunks), batch_size):
-        batch = chunks[i : i + batch_size]
-        resp = openai.embeddings.create(model=model_name, input=batch)
-        for data_obj in resp.data:
-            all_embeddings.append(data_obj.embedding)
-    return all_embeddings
+    Metadata and full texts of the top_k stored chunks nearest to
+    `embedding`, best first. Reads the store; call it on the thread pool.
+    """
+    if ef_search and ef_search > top_k and chroma_client is not None:
+        # hnswlib searches with ef = max(search_ef, n_results), so asking for
+        # ef_search candidates widens the search; only the best top_k are kept,
+        # and only those are read back
+        candidates = collection.query(
+            query_embeddings=[embedding],
+            n_results=ef_search,
+            include=["distances"],
+        )
+        ids = candidates["ids"][0][:top_k]
+        found = collection.get(ids=ids, include=["metadatas", "documents"])
+        rows = dict(zip(found["ids"], zip(found["metadatas"], found["documents"])))
+        metadatas = [rows[i][0] for i in ids if i in rows]
+        documents = [rows[i][1] for i in ids if i in rows]
+    else:
+        results = collection.query(
+            query_embeddings=[embedding],
+            n_results=top_k,
+            include=["metadatas", "documents"]
+        )
+        metadatas = results["metadatas"][0]  # list of metadata dicts
+        documents = results["documents"][0]
+    return metadatas, rebuild_chunk_texts(metadatas, documents)
 
 
 def build_answer_prompt(question: str, relevant_chunks: List[Dict]) -> str:
@@ -222,101 +990,397 @@ async def read_root():
     }
 
 
-# ─── 10. /upload Endpoint ─────────────────────────────────────────────────────
-@app.post("/upload", response_model=UploadResponse)
-async def upload_document(file: UploadFile = File(...)):
+@app.get("/metrics")
+async def read_metrics():
+    return {
+        "embedding_cache": embedding_cache.stats(),
+        "translation_cache": translation_cache.stats(),
+        "openai_scheduler": openai_scheduler.stats(),
+    }
+
+
+# ─── 10. Ingestion Pipeline & Background Jobs ──────────────────────────────
+@dataclass
+class IngestJob:
+    """
+    Progress of one ingestion. Synchronous uploads track one as well, so
+    both paths go through the same pipeline code.
+    """
+    filename: str
+    id: str = field(default_factory=lambda: uuid.uuid4().hex)
+    stage: str = "queued"
+    read_progress: float = 0.0
+    chunks_embedded: int = 0
+    total_chunks: Optional[int] = None
+    timings: Dict[str, float] = field(default_factory=dict)
+    error: Optional[str] = None
+    result: Optional[Dict] = None
+    created_at: float = field(default_factory=time.time)
+    _stage_started: float = field(default_factory=time.monotonic, repr=False)
+
+    @property
+    def finished(self) -> bool:
+        return self.stage in ("done", "failed")
+
+    def set_stage(self, stage: str) -> None:
+        now = time.monotonic()
+        self.add_timing(self.stage, now - self._stage_started)
+        self.stage = stage
+        self._stage_started = now
+
+    def add_timing(self, name: str, seconds: float) -> None:
+        self.timings[name] = self.timings.get(name, 0.0) + seconds
+
+    def set_read_progress(self, done: int, total: int) -> None:
+        self.read_progress = done / total if total else 1.0
+
+    def status(self) -> Dict:
+        return {
+            "job_id": self.id,
+            "filename": self.filename,
+            "stage": self.stage,
+            "read_progress": round(self.read_progress, 3),
+            "chunks_embedded": self.chunks_embedded,
+            "total_chunks": self.total_chunks,
+            "timings": {name: round(seconds, 3) for name, seconds in self.timings.items()},
+            "error": self.error,
+            "result": self.result,
+        }
+
+
+def ingested_in_mode(metadatas: List[Dict], translate: bool, default_language: str) -> bool:
+    """
+    Whether stored chunks match an ingestion with `translate`: their
+    non-English chunks are translated exactly when it is on. Rows without
+    the flags predate translate=false and were translated.
+    """
+    for md in metadatas:
+        wanted = needs_translation(md.get("original_language", default_language))
+        if md.get("translated", wanted) != (translate and wanted):
+            return False
+    return True
+
+
+async def ingest_document(
+    file_stream: BinaryIO, filename: str, ext: str, digest: str, job: IngestJob, translate: bool
+) -> Dict:
+    """
+    Run the whole pipeline on a spooled upload: dedup check, extraction,
+    language detection / translation (unless `translate` is off), chunking,
+    embedding and storage. Keeps `job` up to date and returns an
+    IngestSummary-shaped dict.
+
+    Re-uploading a changed version of a file is a diff against the stored
+    chunks: only new chunk texts are embedded, unchanged ones keep their
+    stored embeddings, and chunks that are gone are deleted at the end.
+    """
+    job.set_stage("reading")
+
+    # A byte-identical file was ingested before, in the same translate mode:
+    # nothing to do. In the other mode it is re-ingested through the diff below.
+    known = await run_in_threadpool(fingerprints.get, digest)
+    if known is not None:
+        stored = (
+            await run_in_threadpool(collection.get, where={"source": known["filename"]}, include=["metadatas"])
+        )["metadatas"]
+        if (
+            stored
+            and len(stored) == known["total_chunks"]
+            and ingested_in_mode(stored, translate, known["original_language"])
+        ):
+            job.read_progress = 1.0
+            job.chunks_embedded = job.total_chunks = len(stored)
+            job.set_stage("done")
+            return {
+                "filename": known["filename"],
+                "total_chunks": len(stored),
+                "original_language": known["original_language"],
+                "translated": any(md.get("translated", known["original_language"] != "en") for md in stored),
+                "deduplicated": True,
+                "chunks_reused": len(stored),
+            }
+        # The store lost those chunks since (e.g. it was reset), or they were
+        # stored in the other translate mode, so ingest again
+        await run_in_threadpool(fingerprints.discard, digest)
+
+    # Extractors read from the on-disk spool, never from a bytes copy of the body,
+    # and every stage below consumes the previous one as a stream
+    pieces = iter_document_text(file_stream, ext, job.set_read_progress)
+
+    # Fail fast on documents with no text; the head is replayed below
+    head_text, pieces = await peek_text(pieces, 1)
+    if not head_text.strip():
+        raise HTTPException(status_code=400, detail="No extractable text in document")
+
+    # Detect the language of each segment and translate the non-English ones,
+    # unless translation is deferred to query time. Segment languages are kept
+    # by output offset, so each chunk can be tagged with the language it came from.
+    segment_offsets: List[int] = []
+    segment_languages: List[Tuple[str, bool]] = []
+    language_chars = Counter()
+
+    async def output_text() -> AsyncIterator[str]:
+        offset = 0
+        async for text, language, was_translated in translate_stream(detect_segment_languages(pieces), translate):
+            segment_offsets.append(offset)
+            segment_languages.append((language, was_translated))
+            language_chars[language] += len(text)
+            offset += len(text)
+            yield text
+
+    # Chunks of an earlier version of this file; whatever isn't matched by a
+    # chunk of this version is deleted once it is fully stored
+    stale = set((await run_in_threadpool(collection.get, where={"source": filename}, include=[]))["ids"])
+    occurrences = Counter()
+    reused = 0
+
+    # Chunk the (possibly translated) text, then embed and upsert into the
+    # store in bounded batches. Ids and metadata are assigned in document order;
+    # up to EMBEDDING_MAX_CONCURRENCY batches are embedded at once, and they are
+    # written back in order.
+    job.set_stage("embedding")
+    total = 0
+    previous_end = 0
+    any_translated = False
+
+    async def labelled_batches() -> AsyncIterator[Tuple[List[str], List[str], List[Dict], List[str]]]:
+        nonlocal total, previous_end, any_translated
+        async for batch in abatched(chunk_text_stream(output_text()), INGEST_BATCH_SIZE):
+            # Chunk texts are only materialized here, for ids and embedding requests
+            texts = [c.text for c in batch]
+            ids = []
+            for text in texts:
+                # Content-addressed, so the same text in a later version gets the same
+                # id; the occurrence count tells repeats of one text apart
+                content = hashlib.sha256(text.encode("utf-8")).hexdigest()[:32]
+                occurrences[content] += 1
+                ids.append(f"{filename}_{content}_{occurrences[content]}")
+
+            metadatas = []
+            documents = []
+            for idx, chunk in enumerate(batch, start=total):
+                span_start = max(chunk.start, previous_end)
+                previous_end = chunk.end
+                # A chunk straddling two segments takes the language of its midpoint
+                language, translated = segment_languages[
+                    bisect_right(segment_offsets, (chunk.start + chunk.end) // 2) - 1
+                ]
+                any_translated = any_translated or translated
+                metadatas.append({
+                    "source": filename,
+                    "revision": digest,
+                    "chunk_index": idx,
+                    "original_language": language,
+                    "translated": translated,
+                    "start": chunk.start,
+                    "end": chunk.end,
+                    "span_start": span_start,
+                })
+                documents.append(chunk.text_from(span_start))
+            total += len(batch)
+            yield ids, texts, metadatas, documents
+        job.total_chunks = total
+
+    async def embed_labelled(labelled) -> Tuple[List[str], List[Dict], List[str], List[int], List[List[float]], List[int]]:
+        ids, texts, metadatas, documents = labelled
+        started = time.monotonic()
+        kept = [i for i in ids if i in stale]
+        stored = await run_in_threadpool(read_stored_rows, kept) if kept else {}
+        read = time.monotonic()
+        job.add_timing("store_reads", read - started)
+
+        # A kept chunk keeps its stored embedding and only gets its metadata
+        # rewritten, if its index or offsets moved. Chroma can't change a
+        # document without re-embedding it, so a kept chunk whose span moved
+        # (its predecessor changed) is written again, from the embedding cache.
+        changed, moved = [], []
+        for j, i in enumerate(ids):
+            if i not in stored or stored[i][1] != documents[j]:
+                changed.append(j)
+            elif {**stored[i][0], "revision": digest} != metadatas[j]:
+                moved.append(j)
+        fresh = await get_embeddings_for_chunks([texts[j] for j in changed])
+        job.add_timing("embedding_calls", time.monotonic() - read)
+        return ids, metadatas, documents, changed, fresh, moved
+
+    written = 0
+    async for ids, metadatas, documents, changed, fresh, moved in map_ordered(
+        labelled_batches(), embed_labelled, EMBEDDING_MAX_CONCURRENCY
+    ):
+        started = time.monotonic()
+        if changed:
+            await run_in_threadpool(
+                write_chunks,
+                [ids[j] for j in changed],
+                [metadatas[j] for j in changed],
+                [documents[j] for j in changed],
+                fresh,
+            )
+        if moved:
+            await run_in_threadpool(update_chunk_metadata, [ids[j] for j in moved], [metadatas[j] for j in moved])
+        job.add_timing("store_writes", time.monotonic() - started)
+
+        stale.difference_update(ids)
+        reused += len(ids) - len(changed)
+        written += len(ids)
+        job.chunks_embedded = written
+
+    if stale:
+        started = time.monotonic()
+        await run_in_threadpool(delete_chunks, list(stale))
+        job.add_timing("store_writes", time.monotonic() - started)
+
+    # The document's language is the one most of its text is in
+    known_chars = [(chars, language) for language, chars in language_chars.items() if language != UNKNOWN]
+    original_lang = max(known_chars)[1] if known_chars else UNKNOWN
+
+    await run_in_threadpool(fingerprints.add, digest, filename, total, original_lang)
+    job.set_stage("done")
+    return {
+        "filename": filename,
+        "total_chunks": total,
+        "original_language": original_lang,
+        "translated": any_translated,
+        "deduplicated": False,
+        "chunks_reused": reused,
+        "chunks_removed": len(stale),
+    }
+
+
+jobs: Dict[str, IngestJob] = {}
+_job_tasks = set()  # strong references, so running jobs aren't garbage collected
+ingest_slots = asyncio.Semaphore(INGEST_MAX_CONCURRENT_JOBS)
+
+
+def _prune_jobs() -> None:
+    cutoff = time.time() - JOB_TTL_SECONDS
+    for job_id in [j.id for j in jobs.values() if j.finished and j.created_at < cutoff]:
+        del jobs[job_id]
+
+
+async def run_ingest_job(job: IngestJob, spool: BinaryIO, ext: str, digest: str, translate: bool) -> None:
+    """Background task for /upload?async=true; owns (and closes) the spool."""
+    try:
+        with spool as file_stream:
+            async with ingest_slots:
+                job.result = await ingest_document(file_stream, job.filename, ext, digest, job, translate)
+    except Exception as e:
+        job.error = e.detail if isinstance(e, HTTPException) else f"{type(e).__name__}: {e}"
+        job.set_stage("failed")
+        print(f"⚠️  ingestion job {job.id} ({job.filename}) failed: {job.error}", flush=True)
+
+
+# ─── 11. /upload & /jobs Endpoints ──────────────────────────────────────────
+@app.post(
+    "/upload",
+    response_model=UploadResponse,
+    response_model_exclude_none=True,
+    responses={
+        202: {"model": JobStatus},
+        200: {"content": {"application/msgpack": {}, "application/x-ndjson": {}}},
+    },
+)
+async def upload_document(
+    request: Request,
+    file: UploadFile = File(...),
+    run_async: bool = Query(False, alias="async"),
+    translate: Optional[bool] = Query(None, description="Translate before embedding; defaults to TRANSLATE_ON_INGEST"),
+    detail: str = Query(
+        "summary",
+        pattern="^(summary|chunks|ndjson)$",
+        description="summary; chunks: also every chunk with its embedding; "
+        "ndjson: stream the summary, then one chunk per line",
+    ),
+    embedding_dtype: str = Query("float32", pattern="^(float32|float16)$"),
+):
+    # Responses are serialized as negotiated from Accept (?detail=ndjson is
+    # always NDJSON); settle that before doing any work
+    media_type = NDJSON if detail == "ndjson" else negotiate(request.headers.get("accept"))
     filename = file.filename or ""
     if not filename:
         raise HTTPException(status_code=400, detail="No filename provided")
 
-    contents = await file.read()
-    file_stream = io.BytesIO(contents)
-
     ext = filename.lower().split(".")[-1]
-    if ext == "pdf":
-        raw_text = extract_text_from_pdf(file_stream)
-    elif ext in ("docx", "doc"):
-        raw_text = extract_text_from_docx(file_stream)
-    elif ext in ("txt", "md", "text"):
-        raw_text = extract_text_from_txt(file_stream)
-    else:
+    if ext not in SUPPORTED_EXTENSIONS:
         raise HTTPException(status_code=400, detail=f"Unsupported file type: {ext}")
 
-    if not raw_text.strip():
-        raise HTTPException(status_code=400, detail="No extractable text in document")
+    if run_async and sum(not j.finished for j in jobs.values()) >= INGEST_MAX_QUEUED_JOBS:
+        raise HTTPException(status_code=429, detail="Too many ingestion jobs in progress")
 
-    # Detect and translate if not English
-    detected_lang = detect_language_of_text(raw_text)
-    if detected_lang != "en":
-        raw_text = await translate_to_english(raw_text)
-        original_lang = detected_lang
-    else:
-        original_lang = "en"
-
-    # Chunk the (possibly translated) text
-    chunk_list = chunk_text(raw_text, chunk_size=1000, overlap=200)
-
-    # Generate embeddings
-    embeddings = get_embeddings_for_chunks(chunk_list)
-
-    # Upsert into ChromaDB
-    ids = []
-    metadatas = []
-    documents = []
-    for idx, chunk in enumerate(chunk_list):
-        chunk_id = f"{filename}_chunk_{idx}"
-        ids.append(chunk_id)
-        metadatas.append({
-            "source": filename,
-            "chunk_index": idx,
-            "original_language": original_lang
-        })
-        documents.append(chunk)
+    if translate is None:
+        translate = TRANSLATE_ON_INGEST
 
-    collection.add(
-        ids=ids,
-        metadatas=metadatas,
-        documents=documents,
-        embeddings=embeddings,
-    )
+    spool, digest = await spool_upload(file)
+    job = IngestJob(filename=filename)
 
-    response_chunks = []
-    for idx, (c, emb) in enumerate(zip(chunk_list, embeddings)):
-        response_chunks.append({
-            "chunk_index": idx,
-            "text": c,
-            "original_language": original_lang,
-            "embedding": emb,
-        })
+    # Hand the spool to a background task and return straight away
+    if run_async:
+        _prune_jobs()
+        jobs[job.id] = job
+        task = asyncio.create_task(run_ingest_job(job, spool, ext, digest, translate))
+        _job_tasks.add(task)
+        task.add_done_callback(_job_tasks.discard)
+        return render(job.status(), media_type, status_code=202)
 
-    return {
-        "filename": filename,
-        "total_chunks": len(response_chunks),
-        "chunks": response_chunks,
-    }
+    with spool as file_stream:
+        async with ingest_slots:
+            summary = await ingest_document(file_stream, filename, ext, digest, job, translate)
+    summary["timings"] = job.status()["timings"]
+    if detail == "summary":
+        return render(summary, media_type)
+
+    chunks = iter_stored_chunks(summary["filename"], summary["total_chunks"], embedding_dtype)
+    summary["embedding_dtype"] = embedding_dtype
+    if detail == "chunks":
+        return render({**summary, "chunks": await run_in_threadpool(list, chunks)}, media_type)
+
+    def ndjson_lines() -> Iterator[bytes]:
+        yield dumps_json(summary) + b"\n"
+        for chunk in chunks:
+            yield dumps_json(chunk) + b"\n"
 
+    return StreamingResponse(ndjson_lines(), media_type=NDJSON)
 
-# ─── 11. /query Endpoint ─────────────────────────────────────────────────────
-@app.post("/query", response_model=QueryResponse)
-async def query_document(q: QueryRequest):
+
+@app.get("/jobs/{job_id}", response_model=JobStatus)
+async def get_job(job_id: str):
+    job = jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Unknown job id")
+    return job.status()
+
+
+# ─── 12. /query Endpoint ─────────────────────────────────────────────────────
+@app.post("/query", response_model=QueryResponse, responses={200: {"content": {"application/msgpack": {}}}})
+async def query_document(q: QueryRequest, request: Request):
     print(f"➡️  /query called with question={q.question!r}, top_k={q.top_k}", flush=True)
+    media_type = negotiate(request.headers.get("accept"))
     question = q.question.strip()
     if not question:
         raise HTTPException(status_code=400, detail="Question must not be empty")
 
     # 1. Create embedding for the question
-    resp = openai.embeddings.create(model="text-embedding-3-small", input=[question])
+    resp = await openai_scheduler.call(
+        EMBEDDING_MODEL,
+        count_tokens([question])[0],
+        lambda: openai_client.embeddings.create(
+            model=EMBEDDING_MODEL, input=[question], dimensions=EMBEDDING_DIMENSIONS
+        ),
+    )
     question_embedding = resp.data[0].embedding
 
-    # 2. Query Chroma for top_k similar chunks
-    results = collection.query(
-        query_embeddings=[question_embedding],
-        n_results=q.top_k,
-        include=["metadatas", "documents"]
-    )
+    # 2. Query the store for top_k similar chunks
+    metadatas, docs = await run_in_threadpool(search_chunks, question_embedding, q.top_k, q.ef_search)
+
+    # Chunks ingested without translation are translated now, and only these
+    async def to_english(md: Dict, text: str) -> str:
+        language = md.get("original_language", "en")
+        if md.get("translated", True) or not needs_translation(language):
+            return text
+        translated = await translate_to_english(text, language)
+        return text if translated is None else translated
 
-    metadatas = results["metadatas"][0]  # list of metadata dicts
-    docs = results["documents"][0]        # list of chunk texts
+    docs = await asyncio.gather(*(to_english(md, text) for md, text in zip(metadatas, docs)))
 
     relevant_chunks = []
     for md, chunk_text in zip(metadatas, docs):
@@ -329,14 +1393,18 @@ async def query_document(q: QueryRequest):
     prompt = build_answer_prompt(question, relevant_chunks)
 
     try:
-        chat_resp = openai.chat.completions.create(
-            model="gpt-3.5-turbo",
-            messages=[
-                {"role": "system", "content": "You are a helpful AI assistant."},
-                {"role": "user", "content": prompt},
-            ],
-            max_tokens=512,
-            temperature=0.2,
+        chat_resp = await openai_scheduler.call(
+            CHAT_MODEL,
+            count_tokens([prompt])[0] + 512,
+            lambda: openai_client.chat.completions.create(
+                model=CHAT_MODEL,
+                messages=[
+                    {"role": "system", "content": "You are a helpful AI assistant."},
+                    {"role": "user", "content": prompt},
+                ],
+                max_tokens=512,
+                temperature=0.2,
+            ),
         )
         answer = chat_resp.choices[0].message.content.strip()
     except Exception as e:
@@ -347,4 +1415,23 @@ async def query_document(q: QueryRequest):
         for rc in relevant_chunks
     ]
 
-    return {"answer": answer, "citations": citations}
+    return render({"answer": answer, "citations": citations}, media_type)
+
+
+# ─── 13. /export Endpoint ────────────────────────────────────────────────────
+@app.get("/export", responses={200: {"content": {NDJSON: {}, ARROW_STREAM: {}}}})
+async def export_index(
+    format: str = Query("ndjson", pattern="^(ndjson|arrow)$"),
+    source: Optional[str] = Query(None, description="Only export the chunks of this file"),
+):
+    """
+    Stream every stored chunk with its metadata and embedding, as stored
+    (documents are spans), EXPORT_PAGE_SIZE rows at a time.
+    """
+    if format == "arrow" and pa is None:
+        raise HTTPException(status_code=501, detail="Arrow export needs pyarrow installed")
+
+    pages = iter_pages(collection, EXPORT_PAGE_SIZE, where={"source": source} if source else None)
+    if format == "arrow":
+        return StreamingResponse(arrow_stream(pages), media_type=ARROW_STREAM)
+    return StreamingResponse(ndjson_lines(pages), media_type=NDJSON)
@@ -0,0 +1,75 @@
+"""
+PDF text extraction spread across a process pool.
+
+Kept out of main.py so pool workers only import PyPDF2, not the whole app.
+"""
+import asyncio
+import math
+from collections import deque
+from concurrent.futures import Executor
+from typing import AsyncIterator, Callable, List, Optional
+
+import PyPDF2
+
+# Upper bound on pages per pool task, so pages can be streamed out before the
+# whole document is done even when there are few workers
+PAGES_PER_TASK = 16
+
+
+def count_pages(path: str) -> int:
+    return len(PyPDF2.PdfReader(path).pages)
+
+
+def extract_page_range(path: str, start: int, stop: int) -> List[str]:
+    """
+    Pool worker: extract pages [start, stop) of the PDF at `path`.
+    Each worker opens its own reader, since readers can't be pickled.
+    """
+    reader = PyPDF2.PdfReader(path)
+    text = []
+    for i in range(start, stop):
+        try:
+            text.append(reader.pages[i].extract_text() or "")
+        except Exception:
+            continue
+    return text
+
+
+async def iter_pdf_pages(
+    path: str,
+    executor: Optional[Executor],
+    workers: int,
+    progress: Optional[Callable[[int, int], None]] = None,
+) -> AsyncIterator[str]:
+    """
+    Yield the text of every page of the PDF at `path`, in page order, without
+    blocking the event loop. The page range is split into slices that run on
+    `executor`; at most two slices per worker are in flight, so finished pages
+    wait for the consumer instead of piling up in memory. `progress` is called
+    with (pages yielded, page count) as pages go out.
+    """
+    loop = asyncio.get_running_loop()
+    page_count = await loop.run_in_executor(executor, count_pages, path)
+    workers = max(1, workers)
+    step = max(1, min(PAGES_PER_TASK, math.ceil(page_count / workers)))
+    starts = iter(range(0, page_count, step))
+
+    def submit(start: int) -> asyncio.Future:
+        return loop.run_in_executor(executor, extract_page_range, path, start, min(start + step, page_count))
+
+    pending = deque(submit(start) for _, start in zip(range(2 * workers), starts))
+    done = 0
+    try:
+        while pending:
+            pages = await pending.popleft()
+            start = next(starts, None)
+            if start is not None:
+                pending.append(submit(start))
+            for page in pages:
+                done += 1
+                if progress is not None:
+                    progress(done, page_count)
+                yield page
+    finally:
+        for future in pending:
+            future.cancel()
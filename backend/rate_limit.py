@@ -0,0 +1,183 @@
+"""
+Client-side scheduling for OpenAI calls: request/token budgets per model,
+plus retries with jittered exponential backoff for 429s, 5xx and dropped
+connections.
+"""
+import asyncio
+import random
+import time
+from email.utils import parsedate_to_datetime
+from typing import Awaitable, Callable, Dict, Optional, Tuple, TypeVar
+
+import openai
+
+T = TypeVar("T")
+
+RETRYABLE_STATUS = (408, 409, 429)
+
+
+class TokenBucket:
+    """Refills continuously at `per_minute` units per minute, up to one minute's worth."""
+
+    def __init__(self, per_minute: float):
+        self.capacity = float(per_minute)
+        self.rate = per_minute / 60.0
+        self.level = self.capacity
+        self.updated = time.monotonic()
+
+    def delay_for(self, amount: float, now: float) -> float:
+        """Seconds until `amount` units are available (0 if they are now)."""
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+        # Anything larger than the bucket could never fit; let it through once full
+        amount = min(amount, self.capacity)
+        return 0.0 if self.level >= amount else (amount - self.level) / self.rate
+
+    def take(self, amount: float) -> None:
+        self.level -= min(amount, self.capacity)
+
+
+def retry_after_seconds(headers) -> Optional[float]:
+    """Parse Retry-After (seconds or HTTP date) or OpenAI's retry-after-ms."""
+    value = headers.get("retry-after-ms")
+    if value:
+        try:
+            return float(value) / 1000
+        except ValueError:
+            pass
+    value = headers.get("retry-after")
+    if not value:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class RequestScheduler:
+    """
+    Admits calls against per-model requests-per-minute and tokens-per-minute
+    buckets, in arrival order, and retries transient failures. A 429 pauses
+    every caller of that model until its Retry-After has passed.
+    """
+
+    def __init__(
+        self,
+        requests_per_minute: int,
+        tokens_per_minute: int,
+        max_retries: int = 6,
+        base_delay: float = 0.5,
+        max_delay: float = 60.0,
+    ):
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self._buckets: Dict[str, Tuple[TokenBucket, TokenBucket]] = {}
+        self._locks: Dict[str, asyncio.Lock] = {}
+        self._paused_until: Dict[str, float] = {}
+
+        self.queue_depth = 0
+        self.in_flight = 0
+        self.admitted = 0
+        self.retries = 0
+        self.throttled = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+        # Requests and tokens admitted per model; tokens are the callers'
+        # estimates, which include the full output budget of chat calls
+        self.usage: Dict[str, Dict[str, int]] = {}
+
+    async def _admit(self, model: str, tokens: int) -> None:
+        if model not in self._buckets:
+            self._buckets[model] = (
+                TokenBucket(self.requests_per_minute),
+                TokenBucket(self.tokens_per_minute),
+            )
+            self._locks[model] = asyncio.Lock()
+        requests, budget = self._buckets[model]
+
+        started = time.monotonic()
+        self.queue_depth += 1
+        try:
+            # The lock makes callers queue in arrival order
+            async with self._locks[model]:
+                while True:
+                    now = time.monotonic()
+                    delay = max(
+                        self._paused_until.get(model, 0.0) - now,
+                        requests.delay_for(1, now),
+                        budget.delay_for(tokens, now),
+                    )
+                    if delay <= 0:
+                        break
+                    await asyncio.sleep(delay)
+                requests.take(1)
+                budget.take(tokens)
+                usage = self.usage.setdefault(model, {"requests": 0, "tokens": 0})
+                usage["requests"] += 1
+                usage["tokens"] += tokens
+        finally:
+            self.queue_depth -= 1
+
+        waited = time.monotonic() - started
+        self.admitted += 1
+        self.wait_seconds_total += waited
+        self.wait_seconds_max = max(self.wait_seconds_max, waited)
+
+    def _retry_delay(self, error: Exception, attempt: int) -> Optional[float]:
+        retry_after = None
+        if isinstance(error, openai.APIStatusError):
+            if error.status_code not in RETRYABLE_STATUS and error.status_code < 500:
+                return None
+            retry_after = retry_after_seconds(error.response.headers)
+        elif not isinstance(error, openai.APIConnectionError):
+            return None
+        if retry_after is not None:
+            # Small jitter so callers released by the same Retry-After don't stampede
+            return retry_after + random.uniform(0, self.base_delay)
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+    async def call(self, model: str, tokens: int, request: Callable[[], Awaitable[T]]) -> T:
+        """
+        Run `request()` once the budgets for `model` allow `tokens` more,
+        retrying it on retryable errors.
+        """
+        attempt = 0
+        while True:
+            await self._admit(model, tokens)
+            self.in_flight += 1
+            try:
+                return await request()
+            except Exception as e:
+                delay = self._retry_delay(e, attempt)
+                if delay is None or attempt >= self.max_retries:
+                    raise
+                if isinstance(e, openai.RateLimitError):
+                    self.throttled += 1
+                    self._paused_until[model] = max(
+                        self._paused_until.get(model, 0.0), time.monotonic() + delay
+                    )
+                self.retries += 1
+                attempt += 1
+            finally:
+                self.in_flight -= 1
+            await asyncio.sleep(delay)
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            "queue_depth": self.queue_depth,
+            "in_flight": self.in_flight,
+            "admitted": self.admitted,
+            "retries": self.retries,
+            "throttled": self.throttled,
+            "wait_seconds_total": round(self.wait_seconds_total, 3),
+            "wait_seconds_avg": round(self.wait_seconds_total / self.admitted, 3) if self.admitted else 0.0,
+            "wait_seconds_max": round(self.wait_seconds_max, 3),
+            "usage": {model: dict(counts) for model, counts in self.usage.items()},
+        }
@@ -0,0 +1,103 @@
+"""
+Response serialization with content negotiation: JSON (through orjson when
+it is installed) or MessagePack, whichever the Accept header prefers.
+
+Handlers pass the dicts and lists they built themselves, so nothing is
+validated or converted again on the way out. bytes values are sent as
+MessagePack bin, or as base64 strings in JSON.
+"""
+import base64
+import json
+from typing import Any, Dict, Optional
+
+from fastapi import HTTPException
+from starlette.responses import Response
+
+try:
+    import orjson
+except ImportError:  # the stdlib encoder is slower but produces the same JSON
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:  # then only JSON is offered
+    msgpack = None
+
+JSON = "application/json"
+MSGPACK = "application/msgpack"
+NDJSON = "application/x-ndjson"
+# Media types clients use for MessagePack
+_MSGPACK_ALIASES = ("application/msgpack", "application/x-msgpack", "application/vnd.msgpack")
+
+
+def _json_default(value):
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return base64.b64encode(value).decode("ascii")
+    if hasattr(value, "tolist"):  # numpy arrays and scalars
+        return value.tolist()
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+def _msgpack_default(value):
+    if hasattr(value, "tolist"):
+        return value.tolist()
+    raise TypeError(f"{type(value).__name__} is not MessagePack serializable")
+
+
+def dumps_json(content: Any) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(content, default=_json_default, option=orjson.OPT_SERIALIZE_NUMPY)
+    return json.dumps(content, default=_json_default, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def dumps_msgpack(content: Any) -> bytes:
+    return msgpack.packb(content, use_bin_type=True, default=_msgpack_default)
+
+
+def _parse_accept(accept: str) -> Dict[str, float]:
+    ranges = {}
+    for part in accept.split(","):
+        media, *params = [p.strip() for p in part.split(";")]
+        q = 1.0
+        for param in params:
+            name, _, value = param.partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        if media:
+            ranges[media.lower()] = q
+    return ranges
+
+
+def _quality(ranges: Dict[str, float], media_types) -> float:
+    """q for the best of `media_types`, each taken from its most specific matching range."""
+    best = 0.0
+    for media_type in media_types:
+        for candidate in (media_type, media_type.split("/")[0] + "/*", "*/*"):
+            if candidate in ranges:
+                best = max(best, ranges[candidate])
+                break
+    return best
+
+
+def negotiate(accept: Optional[str]) -> str:
+    """
+    JSON or MessagePack for an Accept header. JSON wins ties and is the
+    answer when there is no header; raises 406 if neither is acceptable.
+    """
+    if not accept:
+        return JSON
+    ranges = _parse_accept(accept)
+    json_q = _quality(ranges, (JSON,))
+    msgpack_q = _quality(ranges, _MSGPACK_ALIASES) if msgpack is not None else 0.0
+    if json_q == msgpack_q == 0.0:
+        raise HTTPException(status_code=406, detail="Supported response types: application/json, application/msgpack")
+    return MSGPACK if msgpack_q > json_q else JSON
+
+
+def render(content: Any, media_type: str, status_code: int = 200) -> Response:
+    """Serialize `content` as `media_type`, as returned by negotiate()."""
+    body = dumps_msgpack(content) if media_type == MSGPACK else dumps_json(content)
+    return Response(body, status_code=status_code, media_type=media_type, headers={"Vary": "Accept"})
@@ -0,0 +1,174 @@
+"""
+Bulk export and import of the vector store.
+
+Export reads every stored row (id, document, metadata, embedding) a page at
+a time and writes it out as NDJSON or as an Arrow IPC stream. Rows go out
+exactly as stored (documents are spans, see main.py), so a snapshot, i.e.
+an Arrow export or the same columns as Parquet, can be loaded back into an
+empty store without re-embedding anything.
+"""
+import io
+import json
+from typing import Dict, Iterator, List, Optional
+
+import numpy as np
+
+from serialization import dumps_json
+from vector_store import VectorStore
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # Arrow export and snapshots are unavailable, NDJSON still works
+    pa = pq = None
+
+ARROW_STREAM = "application/vnd.apache.arrow.stream"
+
+
+def iter_pages(collection: VectorStore, page_size: int, where: Optional[Dict] = None) -> Iterator[Dict]:
+    """
+    `collection.get` results of at most `page_size` rows each, until the
+    collection is exhausted. Pages follow Chroma's offsets, so rows written
+    while an export runs may be missed or repeated.
+    """
+    offset = 0
+    while True:
+        page = collection.get(
+            where=where,
+            limit=page_size,
+            offset=offset,
+            include=["documents", "metadatas", "embeddings"],
+        )
+        if len(page["ids"]):
+            yield page
+        if len(page["ids"]) < page_size:
+            return
+        offset += len(page["ids"])
+
+
+def ndjson_lines(pages: Iterator[Dict]) -> Iterator[bytes]:
+    """One JSON object per row; embeddings are base64 of little-endian float32."""
+    for page in pages:
+        rows = zip(page["ids"], page["documents"], page["metadatas"], page["embeddings"])
+        yield b"".join(
+            dumps_json({
+                "id": row_id,
+                "document": document,
+                "metadata": metadata,
+                "embedding": np.asarray(embedding, dtype="<f4").tobytes(),
+            }) + b"\n"
+            for row_id, document, metadata, embedding in rows
+        )
+
+
+def arrow_schema(dimensions: int) -> "pa.Schema":
+    return pa.schema([
+        ("id", pa.string()),
+        ("document", pa.string()),
+        ("metadata", pa.string()),  # JSON: metadata keys differ between rows
+        ("embedding", pa.list_(pa.float32(), dimensions)),
+    ])
+
+
+def page_to_record_batch(page: Dict) -> "pa.RecordBatch":
+    embeddings = np.asarray(page["embeddings"], dtype=np.float32)
+    dimensions = embeddings.shape[1]
+    return pa.record_batch(
+        [
+            pa.array(page["ids"], pa.string()),
+            pa.array(page["documents"], pa.string()),
+            pa.array([json.dumps(md) for md in page["metadatas"]], pa.string()),
+            pa.FixedSizeListArray.from_arrays(pa.array(embeddings.reshape(-1)), dimensions),
+        ],
+        schema=arrow_schema(dimensions),
+    )
+
+
+class _Drain(io.RawIOBase):
+    """Write target that hands back what was written since the last drain()."""
+
+    def __init__(self):
+        self._parts = []
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self._parts.append(bytes(data))
+        return len(data)
+
+    def drain(self) -> bytes:
+        data = b"".join(self._parts)
+        self._parts.clear()
+        return data
+
+
+def arrow_stream(pages: Iterator[Dict]) -> Iterator[bytes]:
+    """
+    Arrow IPC stream of the pages, one record batch per page, yielded as
+    each batch is written. The schema takes its embedding width from the
+    first page (0 if there are no rows).
+    """
+    sink = _Drain()
+    writer = None
+    for page in pages:
+        batch = page_to_record_batch(page)
+        if writer is None:
+            writer = pa.ipc.new_stream(sink, batch.schema)
+        writer.write_batch(batch)
+        yield sink.drain()
+    if writer is None:
+        writer = pa.ipc.new_stream(sink, arrow_schema(0))
+    writer.close()
+    yield sink.drain()
+
+
+def read_snapshot(path: str, batch_size: int) -> Iterator["pa.RecordBatch"]:
+    """
+    Record batches of at most `batch_size` rows from a Parquet file or an
+    Arrow IPC file or stream. Arrow files are memory-mapped, not read in.
+    """
+    if path.endswith(".parquet"):
+        # Pre-buffering would keep every row group read so far in memory
+        yield from pq.ParquetFile(path, pre_buffer=False).iter_batches(batch_size=batch_size)
+        return
+    with pa.memory_map(path) as source:
+        try:
+            reader = pa.ipc.open_file(source)
+            batches = (reader.get_batch(i) for i in range(reader.num_record_batches))
+        except pa.ArrowInvalid:
+            source.seek(0)
+            batches = pa.ipc.open_stream(source)
+        for batch in batches:
+            for start in range(0, batch.num_rows, batch_size):
+                yield batch.slice(start, batch_size)
+
+
+def _embeddings(column: "pa.Array") -> np.ndarray:
+    if pa.types.is_fixed_size_list(column.type):
+        # flatten() honours slice offsets; the reshape is free
+        values = column.flatten().to_numpy(zero_copy_only=False)
+        return values.reshape(-1, column.type.list_size).astype(np.float32, copy=False)
+    return np.asarray(column.to_pylist(), dtype=np.float32)
+
+
+def import_snapshot(collection: VectorStore, path: str, batch_size: int, dimensions: Optional[int] = None) -> int:
+    """
+    Add every row of the snapshot at `path` to `collection`; returns the row
+    count. With `dimensions`, a snapshot of another embedding width raises
+    ValueError before anything is added.
+    """
+    rows = 0
+    for batch in read_snapshot(path, batch_size):
+        embeddings = _embeddings(batch.column("embedding"))
+        if dimensions is not None and embeddings.shape[1] != dimensions:
+            raise ValueError(f"its embeddings have {embeddings.shape[1]} dimensions, not {dimensions}")
+        metadatas: List[Dict] = [json.loads(md) for md in batch.column("metadata").to_pylist()]
+        collection.add(
+            ids=batch.column("id").to_pylist(),
+            embeddings=embeddings,
+            metadatas=metadatas,
+            documents=batch.column("document").to_pylist(),
+        )
+        rows += batch.num_rows
+    return rows
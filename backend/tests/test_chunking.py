@@ -0,0 +1,178 @@
+"""
+The chunker, and chunks as ingestion stores them: each row holds only the
+span after the previous chunk, and reading rows back (detail=chunks, query
+hits) must give the chunker's full texts again. Ingestion runs against a
+scratch Chroma store with the OpenAI calls faked. Run from backend/:
+
+    python -m pytest tests
+"""
+import asyncio
+import hashlib
+import random
+import types
+
+import numpy as np
+import pytest
+
+import chunking
+from chunking import chunk_text
+
+DIMENSIONS = 16
+WORDS = "the of and to in is was for on that with as by at from document query answer".split()
+
+
+@pytest.fixture(autouse=True)
+def estimated_tokens(monkeypatch):
+    # Token counts are estimated, so the tests don't depend on fetching the tokenizer
+    monkeypatch.setattr(chunking, "_tokenizer", None)
+    monkeypatch.setattr(chunking, "_tokenizer_failed", True)
+
+
+def make_text(paragraphs: int, seed: int = 0) -> str:
+    rng = random.Random(seed)
+
+    def sentence() -> str:
+        return " ".join(rng.choice(WORDS) for _ in range(rng.randint(2, 30))).capitalize() + "."
+
+    return "\n\n".join(
+        " ".join(sentence() for _ in range(rng.randint(1, 8))) for _ in range(paragraphs)
+    )
+
+
+def spans(chunks) -> list:
+    return [(c.start, c.end, c.text) for c in chunks]
+
+
+def word_tokenizer():
+    from tokenizers import Tokenizer, models, pre_tokenizers
+
+    tokenizer = Tokenizer(models.WordLevel({"[UNK]": 0, "chunk": 1}, unk_token="[UNK]"))
+    tokenizer.pre_tokenizer = pre_tokenizers.Whitespace()
+    return tokenizer
+
+
+def test_tokenizer_is_read_from_the_local_file(tmp_path, monkeypatch):
+    path = tmp_path / "tokenizer.json"
+    word_tokenizer().save(str(path))
+
+    def no_hub(name):
+        raise AssertionError("fetched from the Hub")
+
+    monkeypatch.setattr(chunking, "TOKENIZER_PATH", str(path))
+    monkeypatch.setattr(chunking, "_tokenizer_failed", False)
+    monkeypatch.setattr(chunking.Tokenizer, "from_pretrained", no_hub)
+    assert chunking.count_tokens(["chunk one two", "chunk"]) == [3, 1]
+
+
+def test_tokenizer_from_the_hub_is_saved_locally(tmp_path, monkeypatch):
+    path = tmp_path / "tokenizer.json"
+    monkeypatch.setattr(chunking, "TOKENIZER_PATH", str(path))
+    monkeypatch.setattr(chunking, "_tokenizer_failed", False)
+    monkeypatch.setattr(chunking.Tokenizer, "from_pretrained", lambda name: word_tokenizer())
+    assert chunking.get_tokenizer() is not None
+    assert chunking.Tokenizer.from_file(str(path)).encode("chunk a").ids == [1, 0]
+
+
+@pytest.mark.parametrize("seed", range(3))
+def test_chunking_pieces_matches_the_whole_text(seed):
+    text = make_text(200, seed)
+    rng = random.Random(seed)
+    cuts = sorted(rng.sample(range(1, len(text)), 300))
+    pieces = [text[a:b] for a, b in zip([0] + cuts, cuts + [len(text)])]
+
+    whole = spans(chunk_text(text))
+    assert len(whole) > 10
+    assert spans(chunk_text(pieces)) == whole
+    assert spans(chunk_text(pieces, 64, 32)) == spans(chunk_text(text, 64, 32))
+
+
+@pytest.fixture(scope="module")
+def main_module(tmp_path_factory):
+    # main opens its store and caches on import, so point them at a scratch directory first
+    state = tmp_path_factory.mktemp("state")
+    with pytest.MonkeyPatch.context() as env:
+        env.setenv("OPENAI_API_KEY", "sk-test")
+        env.setenv("DATA_DIR", str(state / "data"))
+        env.setenv("CHROMA_PATH", str(state / "chroma_db"))
+        env.setenv("EMBEDDING_DIMENSIONS", str(DIMENSIONS))
+        import main
+    return main
+
+
+@pytest.fixture
+def main(main_module, monkeypatch):
+    async def create(model, input, **kwargs):
+        data = []
+        for i, text in enumerate(input):
+            seed = int(hashlib.sha256(text.encode("utf-8")).hexdigest()[:8], 16)
+            embedding = np.random.default_rng(seed).standard_normal(DIMENSIONS).tolist()
+            data.append(types.SimpleNamespace(index=i, embedding=embedding))
+        return types.SimpleNamespace(data=data)
+
+    monkeypatch.setattr(main_module.openai_client.embeddings, "create", create)
+    return main_module
+
+
+def ingest(main, tmp_path, filename: str, text: str) -> dict:
+    data = text.encode("utf-8")
+    path = tmp_path / "upload"
+    path.write_bytes(data)
+    with open(path, "rb") as f:
+        job = main.IngestJob(filename=filename)
+        return asyncio.run(
+            main.ingest_document(f, filename, "txt", hashlib.sha256(data).hexdigest(), job, translate=True)
+        )
+
+
+def rebuilt_rows(main, filename: str) -> dict:
+    found = main.collection.get(where={"source": filename}, include=["metadatas", "documents"])
+    texts = main.rebuild_chunk_texts(found["metadatas"], found["documents"])
+    return {md["chunk_index"]: text for md, text in zip(found["metadatas"], texts)}
+
+
+def assert_stored_as(main, filename: str, summary: dict, expected: list) -> None:
+    assert summary["total_chunks"] == len(expected)
+    stored = main.iter_stored_chunks(filename, summary["total_chunks"], "float32")
+    assert [c["text"] for c in stored] == expected
+    assert rebuilt_rows(main, filename) == dict(enumerate(expected))
+
+
+def test_stored_chunks_read_back_as_chunked(main, tmp_path):
+    text = make_text(150)
+    summary = ingest(main, tmp_path, "doc.txt", text)
+    assert_stored_as(main, "doc.txt", summary, [c.text for c in chunk_text(text)])
+
+    paragraphs = text.split("\n\n")
+    paragraphs[100] = make_text(1, seed=1)
+    paragraphs.insert(40, make_text(2, seed=2))
+    paragraphs[10] = paragraphs[10].replace(" the ", " a ", 1)
+    edited = "\n\n".join(paragraphs)
+    summary = ingest(main, tmp_path, "doc.txt", edited)
+    assert 0 < summary["chunks_reused"] < summary["total_chunks"]
+    assert_stored_as(main, "doc.txt", summary, [c.text for c in chunk_text(edited)])
+    assert main.collection.count() == len(main.collection.get(include=[])["ids"])
+
+
+def test_query_hit_overlapping_several_chunks(main, tmp_path, monkeypatch):
+    # With overlap over a quarter of the chunk size, a chunk cut early at an
+    # anchor can be shorter than the next chunk's overlap
+    def small_chunks(pieces, max_tokens=64, overlap_tokens=32):
+        return chunking.chunk_text_stream(pieces, max_tokens, overlap_tokens)
+
+    monkeypatch.setattr(main, "chunk_text_stream", small_chunks)
+    text = make_text(150, seed=3)
+    expected = [c.text for c in chunk_text(text, 64, 32)]
+    summary = ingest(main, tmp_path, "small.txt", text)
+    assert_stored_as(main, "small.txt", summary, expected)
+
+    found = main.collection.get(where={"source": "small.txt"}, include=["metadatas", "documents"])
+    by_index = {md["chunk_index"]: md for md in found["metadatas"]}
+    reaching_back = [
+        (i, md) for i, md in zip(found["ids"], found["metadatas"])
+        if md["chunk_index"] > 0 and md["start"] < by_index[md["chunk_index"] - 1]["span_start"]
+    ]
+    assert reaching_back
+    # One hit at a time, as a query returns them, with no neighbours alongside
+    for i, md in reaching_back:
+        hit = main.collection.get(ids=[i], include=["metadatas", "documents"])
+        assert main.rebuild_chunk_texts(hit["metadatas"], hit["documents"]) == [expected[md["chunk_index"]]]
@@ -0,0 +1,292 @@
+"""
+NumpyVectorStore against the collection API main.py relies on. Where
+filters are checked against a Chroma collection holding the same rows.
+Run from backend/:
+
+    python -m pytest tests
+"""
+import os
+import uuid
+
+import chromadb
+import numpy as np
+import pytest
+from chromadb.config import Settings
+
+import vector_store
+from vector_store import NumpyVectorStore, _code_bytes, _encode
+
+DIMENSIONS = 16
+
+
+def random_vectors(rows: int, seed: int = 0) -> np.ndarray:
+    return np.random.default_rng(seed).standard_normal((rows, DIMENSIONS)).astype(np.float32)
+
+
+def chunk_rows(vectors: np.ndarray, source: str = "doc.txt", revision: str = "r1", first: int = 0) -> dict:
+    """Rows shaped like ingest_document's."""
+    return {
+        "ids": [f"{source}_{first + i}" for i in range(len(vectors))],
+        "embeddings": vectors,
+        "metadatas": [
+            {"source": source, "revision": revision, "chunk_index": first + i, "translated": False}
+            for i in range(len(vectors))
+        ],
+        "documents": [f"{source} chunk {first + i}" for i in range(len(vectors))],
+    }
+
+
+def exact_top(vectors: np.ndarray, query: np.ndarray, n: int) -> list:
+    units = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+    return list(np.argsort(-(units @ (query / np.linalg.norm(query))), kind="stable")[:n])
+
+
+@pytest.fixture
+def store(tmp_path):
+    return NumpyVectorStore(str(tmp_path / "store"))
+
+
+def test_add_and_get(store):
+    vectors = random_vectors(5)
+    store.add(**chunk_rows(vectors))
+
+    assert store.count() == 5
+    found = store.get(ids=["doc.txt_3", "doc.txt_1", "missing"], include=["metadatas", "documents", "embeddings"])
+    # In the order asked for, without the missing id
+    assert found["ids"] == ["doc.txt_3", "doc.txt_1"]
+    assert found["documents"] == ["doc.txt chunk 3", "doc.txt chunk 1"]
+    assert [md["chunk_index"] for md in found["metadatas"]] == [3, 1]
+    np.testing.assert_allclose(found["embeddings"], vectors[[3, 1]], rtol=1e-5, atol=1e-6)
+    assert store.get(ids=["doc.txt_0"], include=[])["documents"] is None
+
+
+def test_add_keeps_stored_and_first_repeated_ids(store):
+    store.add(**chunk_rows(random_vectors(2)))
+    vectors = random_vectors(3, seed=1)
+    store.add(
+        ids=["doc.txt_0", "new", "new"],
+        embeddings=vectors,
+        metadatas=[{"source": "other"}, {"source": "first"}, {"source": "second"}],
+        documents=["replaced?", "first", "second"],
+    )
+
+    assert store.count() == 3
+    found = store.get(ids=["doc.txt_0", "new"], include=["metadatas", "documents", "embeddings"])
+    assert found["documents"] == ["doc.txt chunk 0", "first"]
+    np.testing.assert_allclose(found["embeddings"][1], vectors[1], rtol=1e-5, atol=1e-6)
+
+
+def test_upsert_replaces_rows(store):
+    vectors = random_vectors(3)
+    store.add(**chunk_rows(vectors))
+
+    # Same embedding: rewritten in place
+    store.upsert(ids=["doc.txt_0"], embeddings=vectors[:1], metadatas=[{"source": "moved"}], documents=["moved"])
+    assert len(store._live) == 3
+    # New embedding: the old row becomes a tombstone
+    changed = random_vectors(1, seed=1)
+    store.upsert(ids=["doc.txt_1"], embeddings=changed, metadatas=[{"source": "changed"}], documents=["changed"])
+    assert len(store._live) == 4 and store.count() == 3
+
+    found = store.get(ids=["doc.txt_0", "doc.txt_1"], include=["documents", "embeddings"])
+    assert found["documents"] == ["moved", "changed"]
+    np.testing.assert_allclose(found["embeddings"][1], changed[0], rtol=1e-5, atol=1e-6)
+    assert store.query(query_embeddings=changed, n_results=1)["ids"] == [["doc.txt_1"]]
+
+
+def test_delete_compacts_past_the_threshold(tmp_path, monkeypatch):
+    monkeypatch.setattr(vector_store, "_MIN_COMPACT_DEAD", 4)
+    path = str(tmp_path / "store")
+    store = NumpyVectorStore(path, quantization="int8")
+    vectors = random_vectors(10)
+    store.add(**chunk_rows(vectors))
+
+    # 3 tombstones: below the threshold
+    store.delete(ids=["doc.txt_0", "doc.txt_1", "doc.txt_2"])
+    assert store._generation == 0 and len(store._live) == 10
+    # 7 tombstones against 3 live rows
+    store.delete(where={"chunk_index": {"$in": [3, 4, 5, 6]}})
+    assert store._generation == 1
+    assert len(store._matrix) == len(store._codes) == 3
+    assert sorted(name for name in os.listdir(path) if not name.startswith("metadata")) == [
+        "codes-1.int8", "vectors-1.f32"
+    ]
+
+    found = store.get(include=["metadatas", "embeddings"])
+    assert found["ids"] == ["doc.txt_7", "doc.txt_8", "doc.txt_9"]
+    np.testing.assert_allclose(found["embeddings"], vectors[7:], rtol=1e-5, atol=1e-6)
+    assert store.query(query_embeddings=vectors[8:9], n_results=1)["ids"] == [["doc.txt_8"]]
+
+
+def test_reopen(tmp_path):
+    path = str(tmp_path / "store")
+    store = NumpyVectorStore(path, metadata={"embedding_dimensions": DIMENSIONS})
+    vectors = random_vectors(6)
+    store.add(**chunk_rows(vectors))
+    store.delete(ids=["doc.txt_2"])
+    del store
+
+    # A torn append: bytes of a row that was never recorded
+    with open(os.path.join(path, "vectors-0.f32"), "ab") as f:
+        f.write(b"\0" * 10)
+    store = NumpyVectorStore(path, metadata={"embedding_dimensions": 8})
+
+    # Metadata is kept from creation, like get_or_create_collection
+    assert store.metadata == {"embedding_dimensions": DIMENSIONS}
+    assert store.count() == 5
+    assert os.path.getsize(os.path.join(path, "vectors-0.f32")) == 6 * DIMENSIONS * 4
+    np.testing.assert_allclose(
+        store.get(ids=["doc.txt_5"], include=["embeddings"])["embeddings"], vectors[5:], rtol=1e-5, atol=1e-6
+    )
+    assert store.query(query_embeddings=vectors[2:3], n_results=1)["ids"] != [["doc.txt_2"]]
+    with pytest.raises(ValueError):
+        store.add(ids=["wide"], embeddings=np.ones((1, DIMENSIONS + 1)), metadatas=[{}], documents=[""])
+
+
+def test_query_is_exact(store):
+    vectors = random_vectors(200)
+    store.add(**chunk_rows(vectors))
+    query = random_vectors(1, seed=1)
+
+    result = store.query(query_embeddings=query, n_results=5, include=["distances", "documents"])
+    expected = exact_top(vectors, query[0], 5)
+    assert result["ids"] == [[f"doc.txt_{i}" for i in expected]]
+    assert result["documents"] == [[f"doc.txt chunk {i}" for i in expected]]
+    assert result["metadatas"] is None
+    units = vectors[expected] / np.linalg.norm(vectors[expected], axis=1, keepdims=True)
+    np.testing.assert_allclose(
+        result["distances"][0], 1 - units @ (query[0] / np.linalg.norm(query[0])), rtol=1e-5, atol=1e-6
+    )
+
+
+@pytest.mark.parametrize("quantization", ["int8", "binary"])
+def test_quantized_query_reranks_in_full_precision(tmp_path, quantization):
+    vectors = random_vectors(300)
+    queries = random_vectors(4, seed=1)
+    exact = NumpyVectorStore(str(tmp_path / "exact"))
+    exact.add(**chunk_rows(vectors))
+    quantized = NumpyVectorStore(str(tmp_path / "quantized"), quantization=quantization, rerank_candidates=300)
+    quantized.add(**chunk_rows(vectors))
+
+    # With every row a candidate, re-ranking makes the result exact
+    expected = exact.query(query_embeddings=queries, n_results=5, include=["distances"])
+    found = quantized.query(query_embeddings=queries, n_results=5, include=["distances"])
+    assert found["ids"] == expected["ids"]
+    np.testing.assert_allclose(found["distances"], expected["distances"], rtol=1e-5, atol=1e-6)
+
+    # With a few, the nearest row to a stored vector still comes first
+    quantized.rerank_candidates = 10
+    nearest = quantized.query(query_embeddings=vectors[[7, 42]], n_results=1, include=["distances"])
+    assert nearest["ids"] == [["doc.txt_7"], ["doc.txt_42"]]
+    np.testing.assert_allclose(nearest["distances"], [[0], [0]], atol=1e-5)
+
+
+@pytest.mark.parametrize("quantization", [None, "int8", "binary"])
+def test_query_with_nothing_to_find_is_empty(tmp_path, quantization):
+    store = NumpyVectorStore(str(tmp_path / "store"), quantization=quantization)
+    store.add(**chunk_rows(random_vectors(5)))
+    query = random_vectors(1, seed=1)
+
+    # A filter matching no row, then a store whose rows are all deleted
+    found = store.query(query_embeddings=query, n_results=3, where={"source": "missing.txt"})
+    assert found["ids"] == [[]] and found["distances"] == [[]] and found["documents"] == [[]]
+    store.delete(where={"source": "doc.txt"})
+    found = store.query(query_embeddings=query, n_results=3)
+    assert found["ids"] == [[]] and found["metadatas"] == [[]]
+
+
+def test_code_file_resyncs_with_the_matrix(tmp_path):
+    path = str(tmp_path / "store")
+    vectors = random_vectors(20)
+    store = NumpyVectorStore(path, quantization="int8")
+    store.add(**chunk_rows(vectors))
+    del store
+
+    # Codes missing after a crash are rebuilt on open
+    codes_path = os.path.join(path, "codes-0.int8")
+    width = _code_bytes("int8", DIMENSIONS)
+    os.truncate(codes_path, 5 * width + 3)
+    store = NumpyVectorStore(path, quantization="int8")
+    np.testing.assert_array_equal(store._codes, _encode("int8", np.asarray(store._matrix)))
+    del store
+
+    # Switching the kind of codes drops the old file
+    store = NumpyVectorStore(path, quantization="binary")
+    assert not os.path.exists(codes_path)
+    np.testing.assert_array_equal(store._codes, _encode("binary", np.asarray(store._matrix)))
+    assert store.query(query_embeddings=vectors[3:4], n_results=1)["ids"] == [["doc.txt_3"]]
+
+
+# The filter shapes main.py sends: a source, a chunk range (iter_stored_chunks),
+# an $or of source/$in/revision clauses (rebuild_chunk_texts)
+WHERE_FILTERS = [
+    {"source": "a.txt"},
+    {"$and": [{"source": "a.txt"}, {"chunk_index": {"$gte": 2}}, {"chunk_index": {"$lt": 5}}]},
+    {"$and": [{"source": "b.txt"}, {"chunk_index": {"$in": [0, 3, 9]}}]},
+    {"$or": [
+        {"$and": [{"source": "a.txt"}, {"chunk_index": {"$in": [1, 2]}}, {"revision": "r1"}]},
+        {"$and": [{"source": "b.txt"}, {"chunk_index": {"$in": [4]}}, {"revision": "r2"}]},
+    ]},
+    {"chunk_index": {"$nin": [0, 1, 2, 3]}},
+    {"translated": False},
+]
+
+
+@pytest.fixture
+def both_stores(tmp_path):
+    rows = [
+        chunk_rows(random_vectors(6), "a.txt", "r1"),
+        chunk_rows(random_vectors(6, seed=1), "b.txt", "r2"),
+    ]
+    numpy_store = NumpyVectorStore(str(tmp_path / "store"))
+    client = chromadb.EphemeralClient(settings=Settings(anonymized_telemetry=False))
+    chroma = client.create_collection(f"test_{uuid.uuid4().hex}")
+    for store in (numpy_store, chroma):
+        for part in rows:
+            store.add(**part)
+    return numpy_store, chroma
+
+
+@pytest.mark.parametrize("where", WHERE_FILTERS)
+def test_where_filters_match_chroma(both_stores, where):
+    numpy_store, chroma = both_stores
+    expected = set(chroma.get(where=where, include=[])["ids"])
+    assert expected
+    assert set(numpy_store.get(where=where, include=[])["ids"]) == expected
+
+    query = random_vectors(1, seed=2)
+    found = numpy_store.query(query_embeddings=query, n_results=3, where=where, include=[])
+    assert set(found["ids"][0]) <= expected
+    assert len(found["ids"][0]) == min(3, len(expected))
+
+    numpy_store.delete(where=where)
+    assert numpy_store.count() == 12 - len(expected)
+    assert not numpy_store.get(where=where, include=[])["ids"]
+
+
+def test_where_filters_reject_unknown_keys_and_operators(store):
+    store.add(**chunk_rows(random_vectors(2)))
+    with pytest.raises(ValueError):
+        store.get(where={"source') OR 1=1 --": "x"})
+    with pytest.raises(ValueError):
+        store.get(where={"chunk_index": {"$regex": "."}})
+    with pytest.raises(ValueError):
+        store.delete()
+
+
+def test_update_matches_chroma(both_stores):
+    numpy_store, chroma = both_stores
+    for store in (numpy_store, chroma):
+        store.update(
+            ids=["a.txt_0", "a.txt_1", "missing"],
+            metadatas=[{"chunk_index": 10}, {"translated": True, "revision": None}, {"chunk_index": 0}],
+        )
+        store.update(ids=["b.txt_0"], metadatas=[{"revision": "r3"}])
+
+    ids = ["a.txt_0", "a.txt_1", "b.txt_0"]
+    expected = chroma.get(ids=ids, include=["metadatas", "documents", "embeddings"])
+    found = numpy_store.get(ids=ids, include=["metadatas", "documents", "embeddings"])
+    assert found["metadatas"] == expected["metadatas"]
+    # Documents and embeddings are untouched
+    assert found["documents"] == expected["documents"] == ["a.txt chunk 0", "a.txt chunk 1", "b.txt chunk 0"]
+    np.testing.assert_allclose(found["embeddings"], expected["embeddings"], rtol=1e-5, atol=1e-6)
@@ -0,0 +1,515 @@
+"""
+Vector stores behind the subset of Chroma's collection API the app uses.
+
+`VectorStore` is that subset as a Protocol (add/upsert/get/query/delete/
+count and `metadata`); a Chroma collection already satisfies it.
+`NumpyVectorStore` is an in-process alternative for corpora small enough to
+scan: exact cosine search over a memory-mapped float32 matrix of unit
+vectors, with ids, documents and metadata in a SQLite sidecar.
+
+The matrix file is append-only. Deleting or replacing a row leaves a
+tombstone (the row simply has no sidecar entry), and once tombstones
+outnumber live rows the live ones are copied to a new file.
+
+With quantization ("int8" or "binary") a query scans compact codes kept
+in a file of their own instead of the matrix, and only re-ranks the best
+candidates against the full-precision rows. The scan then needs 4x
+(int8) or 32x (binary) less memory and bandwidth; the matrix pages only
+need to be in memory for the rows being re-ranked.
+"""
+import glob
+import json
+import os
+import re
+import sqlite3
+import threading
+from typing import Dict, Iterable, List, Optional, Protocol, Sequence, Tuple
+
+import numpy as np
+
+# SQLite's default limit on bound parameters is 999
+_SQL_BATCH = 500
+# Rows scored per matrix product; bounds the temporary score matrix
+_SCORE_BLOCK = 65536
+# Rows of codes scored per top-k merge; int8 codes are widened to float32
+# for the product _WIDEN_ROWS rows at a time
+_CODE_BLOCK = 8192
+_WIDEN_ROWS = 256
+# Tombstones tolerated before a compaction, however few live rows there are
+_MIN_COMPACT_DEAD = 1024
+
+# np.bitwise_count is NumPy >= 2; before that, bytes are looked up in a table
+_POPCOUNT = np.unpackbits(np.arange(256, dtype=np.uint8)[:, None], axis=1).sum(axis=1).astype(np.uint8)
+_bitwise_count = getattr(np, "bitwise_count", _POPCOUNT.__getitem__)
+
+_OPERATORS = {"$eq": "=", "$ne": "!=", "$gt": ">", "$gte": ">=", "$lt": "<", "$lte": "<="}
+_KEY = re.compile(r"^[A-Za-z_][A-Za-z0-9_]*$")
+
+
+class VectorStore(Protocol):
+    """
+    The collection API main.py and snapshots.py rely on, with Chroma's
+    argument names and result shapes: `get` returns flat lists keyed by
+    "ids", "metadatas", "documents" and "embeddings" (None when not in
+    `include`), `query` the same nested one list per query embedding.
+    """
+
+    metadata: Optional[Dict]
+
+    def add(self, ids: List[str], embeddings, metadatas: List[Dict], documents: List[str]) -> None: ...
+
+    def upsert(self, ids: List[str], embeddings, metadatas: List[Dict], documents: List[str]) -> None: ...
+
+    def update(self, ids: List[str], metadatas: List[Dict]) -> None: ...
+
+    def get(
+        self,
+        ids: Optional[List[str]] = None,
+        where: Optional[Dict] = None,
+        limit: Optional[int] = None,
+        offset: Optional[int] = None,
+        include: Sequence[str] = ("metadatas", "documents"),
+    ) -> Dict: ...
+
+    def query(
+        self,
+        query_embeddings,
+        n_results: int = 10,
+        where: Optional[Dict] = None,
+        include: Sequence[str] = ("metadatas", "documents", "distances"),
+    ) -> Dict: ...
+
+    def delete(self, ids: Optional[List[str]] = None, where: Optional[Dict] = None) -> None: ...
+
+    def count(self) -> int: ...
+
+
+def _where_sql(where: Dict) -> Tuple[str, List]:
+    """
+    SQL condition over the sidecar's JSON metadata for a Chroma `where`
+    filter ($and, $or and the comparison, $in and $nin operators).
+    """
+    clauses, params = [], []
+    for key, value in where.items():
+        if key in ("$and", "$or"):
+            parts = [_where_sql(w) for w in value]
+            clauses.append("(" + f" {key[1:].upper()} ".join(sql for sql, _ in parts) + ")")
+            params.extend(p for _, part in parts for p in part)
+            continue
+        if not _KEY.match(key):
+            raise ValueError(f"Unsupported metadata key in where filter: {key!r}")
+        # The path is inlined, not bound, so the expression index on source applies
+        field = f"json_extract(metadata, '$.{key}')"
+        for op, operand in (value if isinstance(value, dict) else {"$eq": value}).items():
+            if op in ("$in", "$nin"):
+                negate = "NOT " if op == "$nin" else ""
+                clauses.append(f"{field} {negate}IN ({','.join('?' * len(operand))})")
+                params.extend(operand)
+            elif op in _OPERATORS:
+                clauses.append(f"{field} {_OPERATORS[op]} ?")
+                params.append(operand)
+            else:
+                raise ValueError(f"Unsupported where operator: {op!r}")
+    return " AND ".join(clauses) or "1", params
+
+
+def _code_bytes(quantization: str, dimensions: int) -> int:
+    # int8: one byte per dimension, then the row's float32 scale
+    return dimensions + 4 if quantization == "int8" else (dimensions + 7) // 8
+
+
+def _encode(quantization: str, vectors: np.ndarray) -> np.ndarray:
+    """Code rows (uint8) for unit `vectors`."""
+    if quantization == "binary":
+        return np.packbits(vectors > 0, axis=1)
+    scales = np.abs(vectors).max(axis=1, keepdims=True) / 127
+    scales[scales == 0] = 1
+    codes = np.rint(vectors / scales).astype(np.int8)
+    return np.concatenate([codes.view(np.uint8), scales.astype("<f4").view(np.uint8)], axis=1)
+
+
+def _code_scores(quantization: str, queries: np.ndarray, codes: np.ndarray) -> np.ndarray:
+    """Approximate scores (higher is closer) of unit `queries` against code rows."""
+    if quantization == "binary":
+        bits = np.packbits(queries > 0, axis=1)
+        # Minus the Hamming distance
+        return -np.stack([
+            _bitwise_count(codes ^ query_bits).sum(axis=1, dtype=np.int32) for query_bits in bits
+        ]).astype(np.float32)
+    dimensions = codes.shape[1] - 4
+    scores = np.empty((len(queries), len(codes)), dtype=np.float32)
+    # Widened a few rows at a time, so the float32 copy stays in cache
+    for first in range(0, len(codes), _WIDEN_ROWS):
+        part = codes[first : first + _WIDEN_ROWS]
+        scales = np.ascontiguousarray(part[:, dimensions:]).view("<f4")[:, 0]
+        scores[:, first : first + len(part)] = (
+            queries @ part[:, :dimensions].view(np.int8).astype(np.float32).T
+        ) * scales
+    return scores
+
+
+def _unit_rows(embeddings) -> Tuple[np.ndarray, np.ndarray]:
+    vectors = np.asarray(embeddings, dtype=np.float32)
+    if vectors.ndim != 2:
+        raise ValueError("Embeddings must be a list of equal-length vectors")
+    norms = np.linalg.norm(vectors, axis=1)
+    return vectors / np.where(norms > 0, norms, 1)[:, None], norms
+
+
+class NumpyVectorStore(VectorStore):
+    """
+    Exact-search store in the directory `path`. Distances are cosine
+    distances (1 - cosine similarity); `get` returns embeddings as they
+    were added, up to float32 rounding. `metadata` is kept from the call
+    that created the store, as Chroma's get_or_create_collection does.
+
+    `quantization` ("int8" or "binary") makes queries approximate: the
+    `rerank_candidates` best rows by code are re-ranked exactly. Codes
+    are derived from the matrix, so it can be switched on, off or changed
+    between runs.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        metadata: Optional[Dict] = None,
+        quantization: Optional[str] = None,
+        rerank_candidates: int = 100,
+    ):
+        if quantization not in (None, "int8", "binary"):
+            raise ValueError(f"Unsupported quantization: {quantization!r}")
+        os.makedirs(path, exist_ok=True)
+        self.path = path
+        self.quantization = quantization
+        self.rerank_candidates = rerank_candidates
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(os.path.join(path, "metadata.sqlite3"), check_same_thread=False)
+        with self._db:
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS rows ("
+                " row INTEGER PRIMARY KEY,"
+                " id TEXT NOT NULL UNIQUE,"
+                " document TEXT,"
+                " metadata TEXT NOT NULL,"
+                " norm REAL NOT NULL)"
+            )
+            self._db.execute("CREATE INDEX IF NOT EXISTS rows_source ON rows (json_extract(metadata, '$.source'))")
+            self._db.execute("CREATE TABLE IF NOT EXISTS settings (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+            self._db.execute(
+                "INSERT OR IGNORE INTO settings VALUES ('metadata', ?), ('generation', '0')",
+                (json.dumps(metadata),),
+            )
+        settings = dict(self._db.execute("SELECT key, value FROM settings"))
+        self.metadata = json.loads(settings["metadata"])
+        self._dimensions = int(settings["dimensions"]) if "dimensions" in settings else None
+        self._generation = int(settings["generation"])
+        # A compaction that didn't commit leaves files of another generation,
+        # and a change of quantization codes of another kind
+        for stray in glob.glob(os.path.join(path, "vectors-*.f32")) + glob.glob(os.path.join(path, "codes-*")):
+            if stray not in (self._vectors_path(), self._codes_path()):
+                os.remove(stray)
+        self._open_matrix()
+
+    # ── matrix file ──
+    def _vectors_path(self, generation: Optional[int] = None) -> str:
+        return os.path.join(self.path, f"vectors-{self._generation if generation is None else generation}.f32")
+
+    def _codes_path(self, generation: Optional[int] = None) -> Optional[str]:
+        if self.quantization is None:
+            return None
+        return os.path.join(
+            self.path, f"codes-{self._generation if generation is None else generation}.{self.quantization}"
+        )
+
+    def _map(self, path: str, dtype, columns: int, rows: int) -> np.ndarray:
+        if not rows:
+            return np.empty((0, columns), dtype=dtype)
+        return np.memmap(path, dtype=dtype, mode="r", shape=(rows, columns))
+
+    def _open_matrix(self) -> None:
+        path = self._vectors_path()
+        rows = 0
+        if self._dimensions:
+            size = os.path.getsize(path) if os.path.exists(path) else 0
+            rows, torn = divmod(size, 4 * self._dimensions)
+            if torn:  # an append cut short; its rows were never recorded
+                os.truncate(path, rows * 4 * self._dimensions)
+        self._matrix = self._map(path, np.float32, self._dimensions or 0, rows)
+        # Rows written but not (or no longer) in the sidecar are tombstones
+        self._live = np.zeros(rows, dtype=bool)
+        self._live[[row for (row,) in self._db.execute("SELECT row FROM rows")]] = True
+        self._open_codes()
+
+    def _open_codes(self) -> None:
+        """Map the code file, first bringing it level with the matrix."""
+        self._codes = None
+        if self.quantization is None or not self._dimensions:
+            return
+        path = self._codes_path()
+        width = _code_bytes(self.quantization, self._dimensions)
+        coded = (os.path.getsize(path) if os.path.exists(path) else 0) // width
+        rows = len(self._matrix)
+        if coded > rows:
+            os.truncate(path, rows * width)
+        elif coded < rows:
+            with open(path, "r+b" if os.path.exists(path) else "wb") as f:
+                f.truncate(coded * width)
+                f.seek(0, os.SEEK_END)
+                for first in range(coded, rows, _SCORE_BLOCK):
+                    _encode(self.quantization, self._matrix[first : first + _SCORE_BLOCK]).tofile(f)
+        self._codes = self._map(path, np.uint8, width, rows)
+
+    def _append(self, vectors: np.ndarray) -> int:
+        """Write `vectors` after the last row; returns the first new row number."""
+        if self._dimensions is None:
+            self._dimensions = vectors.shape[1]
+            with self._db:
+                self._db.execute("INSERT INTO settings VALUES ('dimensions', ?)", (str(self._dimensions),))
+        elif vectors.shape[1] != self._dimensions:
+            raise ValueError(f"Embedding dimension {vectors.shape[1]} does not match the store's {self._dimensions}")
+        first = len(self._live)
+        with open(self._vectors_path(), "ab") as f:
+            vectors.tofile(f)
+            f.flush()
+            os.fsync(f.fileno())
+        self._matrix = self._map(self._vectors_path(), np.float32, self._dimensions, first + len(vectors))
+        self._live = np.concatenate([self._live, np.zeros(len(vectors), dtype=bool)])
+        if self._codes is None:
+            self._open_codes()
+        elif self.quantization is not None:
+            # Not synced: codes missing after a crash are rebuilt on open
+            with open(self._codes_path(), "ab") as f:
+                _encode(self.quantization, vectors).tofile(f)
+            self._codes = self._map(self._codes_path(), np.uint8, self._codes.shape[1], first + len(vectors))
+        return first
+
+    def _compact_if_needed(self) -> None:
+        live = np.flatnonzero(self._live)
+        dead = len(self._live) - len(live)
+        if dead < _MIN_COMPACT_DEAD or dead <= len(live):
+            return
+        generation = self._generation + 1
+        with open(self._vectors_path(generation), "wb") as f:
+            for first in range(0, len(live), _SCORE_BLOCK):
+                np.ascontiguousarray(self._matrix[live[first : first + _SCORE_BLOCK]]).tofile(f)
+            f.flush()
+            os.fsync(f.fileno())
+        if self._codes is not None:
+            with open(self._codes_path(generation), "wb") as f:
+                for first in range(0, len(live), _SCORE_BLOCK):
+                    np.ascontiguousarray(self._codes[live[first : first + _SCORE_BLOCK]]).tofile(f)
+        # Live rows only move down, so renumbering in order never collides
+        with self._db:
+            self._db.executemany(
+                "UPDATE rows SET row = ? WHERE row = ?",
+                ((new, int(old)) for new, old in enumerate(live) if new != old),
+            )
+            self._db.execute("UPDATE settings SET value = ? WHERE key = 'generation'", (str(generation),))
+        old_paths = [self._vectors_path(), self._codes_path()]
+        self._generation = generation
+        self._open_matrix()
+        for path in old_paths:
+            if path is not None and os.path.exists(path):
+                os.remove(path)
+
+    # ── sidecar ──
+    def _rows_for_ids(self, ids: Iterable[str]) -> Dict[str, int]:
+        ids = list(ids)
+        found = {}
+        for first in range(0, len(ids), _SQL_BATCH):
+            part = ids[first : first + _SQL_BATCH]
+            found.update(self._db.execute(
+                f"SELECT id, row FROM rows WHERE id IN ({','.join('?' * len(part))})", part
+            ))
+        return found
+
+    def _select(self, columns: str, ids, where, limit, offset) -> List[Tuple]:
+        if ids is not None:
+            rows = {}
+            for first in range(0, len(ids), _SQL_BATCH):
+                part = ids[first : first + _SQL_BATCH]
+                sql, params = _where_sql(where or {})
+                for found in self._db.execute(
+                    f"SELECT id, {columns} FROM rows WHERE id IN ({','.join('?' * len(part))}) AND {sql}",
+                    (*part, *params),
+                ):
+                    rows[found[0]] = found
+            # In the order asked for, like Chroma
+            return [rows[i] for i in dict.fromkeys(ids) if i in rows][offset or 0 :][:limit]
+        sql, params = _where_sql(where or {})
+        return self._db.execute(
+            f"SELECT id, {columns} FROM rows WHERE {sql} ORDER BY row LIMIT ? OFFSET ?",
+            (*params, -1 if limit is None else limit, offset or 0),
+        ).fetchall()
+
+    # ── collection API ──
+    def add(self, ids, embeddings, metadatas, documents) -> None:
+        """Like Chroma, ids that are already stored are left as they are."""
+        with self._lock:
+            present = self._rows_for_ids(ids)
+        seen = set(present)
+        keep = [j for j, i in enumerate(ids) if not (i in seen or seen.add(i))]
+        if len(keep) < len(ids):
+            ids = [ids[j] for j in keep]
+            embeddings = np.asarray(embeddings, dtype=np.float32)[keep]
+            metadatas = [metadatas[j] for j in keep]
+            documents = [documents[j] for j in keep]
+        if ids:
+            self.upsert(ids, embeddings, metadatas, documents)
+
+    def upsert(self, ids, embeddings, metadatas, documents) -> None:
+        """
+        Store rows, replacing ones with the same id. A replaced row whose
+        embedding is unchanged keeps its place in the matrix; otherwise the
+        old row becomes a tombstone and the new one is appended.
+        """
+        vectors, norms = _unit_rows(embeddings)
+        with self._lock:
+            present = self._rows_for_ids(ids)
+            same = {
+                i: row
+                for i, row, vector in zip(ids, (present.get(i) for i in ids), vectors)
+                if row is not None and np.allclose(self._matrix[row], vector, rtol=0, atol=1e-6)
+            }
+            new = [j for j, i in enumerate(ids) if i not in same]
+            first = self._append(vectors[new]) if new else 0
+            rows = dict(same)
+            rows.update((ids[j], first + n) for n, j in enumerate(new))
+            with self._db:
+                self._db.executemany(
+                    "DELETE FROM rows WHERE id = ?", ((ids[j],) for j in new if ids[j] in present)
+                )
+                self._db.executemany(
+                    "INSERT OR REPLACE INTO rows VALUES (?, ?, ?, ?, ?)",
+                    (
+                        (rows[i], i, document, json.dumps(metadata), float(norm))
+                        for i, document, metadata, norm in zip(ids, documents, metadatas, norms)
+                    ),
+                )
+            self._live[[present[ids[j]] for j in new if ids[j] in present]] = False
+            self._live[list(rows.values())] = True
+            self._compact_if_needed()
+
+    def update(self, ids, metadatas) -> None:
+        """
+        Change the metadata of stored rows, leaving their documents and
+        embeddings alone. Like Chroma, it is merged into the stored metadata,
+        a key set to None is removed and unknown ids are ignored.
+        """
+        with self._lock:
+            stored = dict(self._select("metadata", list(ids), None, None, None))
+            changes = []
+            for i, metadata in zip(ids, metadatas):
+                if i in stored:
+                    merged = {**json.loads(stored[i]), **metadata}
+                    changes.append((json.dumps({k: v for k, v in merged.items() if v is not None}), i))
+            with self._db:
+                self._db.executemany("UPDATE rows SET metadata = ? WHERE id = ?", changes)
+
+    def get(self, ids=None, where=None, limit=None, offset=None, include=("metadatas", "documents")) -> Dict:
+        with self._lock:
+            found = self._select("row, document, metadata, norm", ids, where, limit, offset)
+            embeddings = None
+            if "embeddings" in include:
+                rows = np.array([f[1] for f in found], dtype=np.int64)
+                norms = np.array([f[4] for f in found], dtype=np.float32)
+                embeddings = self._matrix[rows] * norms[:, None]
+        return {
+            "ids": [f[0] for f in found],
+            "documents": [f[2] for f in found] if "documents" in include else None,
+            "metadatas": [json.loads(f[3]) for f in found] if "metadatas" in include else None,
+            "embeddings": embeddings,
+        }
+
+    def _top(self, queries: np.ndarray, live: np.ndarray, n: int) -> List[List[Tuple[float, int]]]:
+        """
+        Best `n` (score, row) pairs per query among `live` rows, best first:
+        exact scores, or code scores when quantized.
+        """
+        block = _SCORE_BLOCK if self._codes is None else _CODE_BLOCK
+        # Running best n per query, merged block by block
+        best_scores = np.full((len(queries), 0), -np.inf, dtype=np.float32)
+        best_rows = np.zeros((len(queries), 0), dtype=np.int64)
+        for first in range(0, len(live), block):
+            block_live = live[first : first + block]
+            if not block_live.any():
+                continue
+            stop = first + len(block_live)
+            if self._codes is None:
+                scores = queries @ self._matrix[first:stop].T
+            else:
+                scores = _code_scores(self.quantization, queries, self._codes[first:stop])
+            scores[:, ~block_live] = -np.inf
+            scores = np.concatenate([best_scores, scores], axis=1)
+            rows = np.concatenate([
+                best_rows,
+                np.broadcast_to(np.arange(first, stop), (len(queries), len(block_live))),
+            ], axis=1)
+            top = np.argpartition(-scores, min(n, scores.shape[1]) - 1, axis=1)[:, :n]
+            best_scores = np.take_along_axis(scores, top, axis=1)
+            best_rows = np.take_along_axis(rows, top, axis=1)
+        order = np.argsort(-best_scores, axis=1, kind="stable")
+        best_scores = np.take_along_axis(best_scores, order, axis=1)
+        best_rows = np.take_along_axis(best_rows, order, axis=1)
+        return [
+            [(float(score), int(row)) for score, row in zip(scores, rows) if score > -np.inf]
+            for scores, rows in zip(best_scores, best_rows)
+        ]
+
+    def _rerank(self, query: np.ndarray, candidates: List[Tuple[float, int]], n: int) -> List[Tuple[float, int]]:
+        """The best `n` candidates by exact score; reads only their rows of the matrix."""
+        rows = np.sort(np.array([row for _, row in candidates], dtype=np.int64))
+        scores = self._matrix[rows] @ query
+        best = np.argsort(-scores, kind="stable")[:n]
+        return [(float(scores[i]), int(rows[i])) for i in best]
+
+    def query(self, query_embeddings, n_results=10, where=None, include=("metadatas", "documents", "distances")) -> Dict:
+        queries, _ = _unit_rows(query_embeddings)
+        result = {"ids": [], "distances": [], "metadatas": [], "documents": []}
+        with self._lock:
+            live = self._live
+            if where:
+                live = np.zeros_like(live)
+                live[[row for _, row in self._select("row", None, where, None, None)]] = True
+                live &= self._live
+            if self._codes is None:
+                found = self._top(queries, live, n_results)
+            else:
+                candidates = self._top(queries, live, max(n_results, self.rerank_candidates))
+                found = [self._rerank(query, hits, n_results) for query, hits in zip(queries, candidates)]
+
+            for hits in found:
+                by_row = {}
+                for first in range(0, len(hits), _SQL_BATCH):
+                    part = [r for _, r in hits[first : first + _SQL_BATCH]]
+                    by_row.update(
+                        (row[0], row)
+                        for row in self._db.execute(
+                            f"SELECT row, id, document, metadata FROM rows WHERE row IN ({','.join('?' * len(part))})",
+                            part,
+                        )
+                    )
+                result["ids"].append([by_row[r][1] for _, r in hits])
+                result["distances"].append([1 - s for s, _ in hits])
+                result["documents"].append([by_row[r][2] for _, r in hits])
+                result["metadatas"].append([json.loads(by_row[r][3]) for _, r in hits])
+        for key in ("distances", "metadatas", "documents"):
+            if key not in include:
+                result[key] = None
+        result["embeddings"] = None
+        return result
+
+    def delete(self, ids=None, where=None) -> None:
+        if ids is None and not where:
+            raise ValueError("delete needs ids or a where filter")
+        with self._lock:
+            doomed = [(i, row) for i, row in self._select("row", ids, where, None, None)]
+            with self._db:
+                self._db.executemany("DELETE FROM rows WHERE id = ?", ((i,) for i, _ in doomed))
+            self._live[[row for _, row in doomed]] = False
+            self._compact_if_needed()
+
+    def count(self) -> int:
+        with self._lock:
+            return int(self._live.sum())